@@ -4,6 +4,7 @@ import fitz  # PyMuPDF
 import pdfplumber
 import pandas as pd
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image 
 from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
@@ -23,6 +24,8 @@ os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
+# Max processes used to recompress images (1 = serial)
+app.config['COMPRESS_WORKERS'] = int(os.environ.get('COMPRESS_WORKERS', os.cpu_count() or 1))
 
 # --- HELPER: Format File Size ---
 def get_size_format(b, factor=1024, suffix="B"):
@@ -33,59 +36,162 @@ def get_size_format(b, factor=1024, suffix="B"):
         b /= factor
     return f"{b:.2f}Y{suffix}"
 
-# --- HELPER: Intelligent Image Compressor ---
-def compress_images_in_pdf(doc, quality=50, max_width=1024):
+# PIL mode for each Pixmap component count
+_PIL_MODES = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
+# --- HELPER: Wrap Pixmap samples as a PIL Image ---
+def _pixmap_to_pil(width, height, n, samples):
+    # Uses the raw sample buffer directly, no PNG encode/decode round trip
+    mode = _PIL_MODES[n]
+    return Image.frombuffer(mode, (width, height), samples, "raw", mode, 0, 1)
+
+# --- HELPER: Recompress a single image (also runs inside pool workers) ---
+def _recompress_image(job):
     """
-    Iterates through the PDF, finds images, downscales/compresses them,
-    and replaces the original streams.
+    Downscales one extracted image and encodes it as JPEG. The payload is
+    either raw JPEG bytes or (width, height, n, samples) from a Pixmap.
+    Returns (xref, skip_reason) for skipped images and (xref, exception) on failure.
+    """
+    xref, payload, quality, max_width = job
+    try:
+        # Plain JPEGs arrive undecoded; decode them here
+        if isinstance(payload, bytes):
+            pix = fitz.Pixmap(payload)
+            if pix.n - pix.alpha > 3:
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            payload = (pix.width, pix.height, pix.n, pix.samples_mv)
+
+        width, height, n, samples = payload
+
+        # Skip small images (likely icons/logos)
+        if width < 100 or height < 100:
+            return xref, "too_small"
+
+        # Convert to PIL Image
+        pil_img = _pixmap_to_pil(width, height, n, samples)
+
+        # Resize if too large (Downsampling)
+        if pil_img.width > max_width:
+            ratio = max_width / float(pil_img.width)
+            new_height = int(float(pil_img.height) * ratio)
+            pil_img = pil_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+
+        # Compress to JPEG
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return xref, (buffer.getvalue(), pil_img.width, pil_img.height, pil_img.mode)
+
+    except Exception as e:
+        return xref, e
+
+# --- HELPER: Write a recompressed JPEG back into the PDF ---
+def _replace_image_stream(doc, xref, jpeg_data, width, height, mode):
+    # The stream is now a JPEG of a new size, so the image dictionary must match it
+    doc.update_stream(xref, jpeg_data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Decode", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if mode == "L" else "/DeviceRGB")
+
+# --- HELPER: Read an integer entry from an image dictionary ---
+def _image_int_key(doc, xref, key):
+    typ, val = doc.xref_get_key(xref, key)
+    return int(val) if typ == "int" else None
+
+# --- HELPER: Skip images that can't get smaller, without decoding them ---
+def _precheck_image(doc, xref, quality, max_width):
     """
-    # Track images we've already compressed to avoid duplicates
+    Looks only at the image dictionary (filter, dimensions, bytes per pixel).
+    Returns a skip reason, or None if the image should be recompressed.
+    """
+    # Stencil masks are 1-bit and must stay that way
+    if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+        return "mask"
+
+    width = _image_int_key(doc, xref, "Width")
+    height = _image_int_key(doc, xref, "Height")
+    if width and height and (width < 100 or height < 100):
+        return "too_small"
+
+    # Bilevel scans are already far smaller than any JPEG would be
+    filt = doc.xref_get_key(xref, "Filter")[1]
+    if _image_int_key(doc, xref, "BitsPerComponent") == 1 or "JBIG2Decode" in filt or "CCITTFaxDecode" in filt:
+        return "bilevel"
+
+    # JPEGs that need no downscaling and are already lean enough
+    if filt == "/DCTDecode" and width and height and width <= max_width:
+        # Rough JPEG output size per pixel at this quality (q30 ~ 0.1, q60 ~ 0.2 bytes)
+        if len(doc.xref_stream_raw(xref)) / float(width * height) <= quality / 300.0:
+            return "already_optimal"
+
+    return None
+
+# --- HELPER: Pull every image stream out of the PDF once, in xref order ---
+def _extract_image_jobs(doc, quality, max_width, stats):
+    # Track images we've already seen to avoid duplicates
     img_xrefs = set()
-    
     for page_num in range(len(doc)):
-        page = doc[page_num]
-        images = page.get_images()
-        
-        for img in images:
-            xref = img[0]
-            if xref in img_xrefs:
-                continue
-            img_xrefs.add(xref)
+        for img in doc[page_num].get_images():
+            img_xrefs.add(img[0])
 
-            # Extract image
-            try:
-                pix = fitz.Pixmap(doc, xref)
-                
-                # Skip small images (likely icons/logos)
-                if pix.width < 100 or pix.height < 100:
-                    continue
-
-                # Handle CMYK/Alpha conversion
-                if pix.n - pix.alpha > 3:
-                    pix = fitz.Pixmap(fitz.csRGB, pix, 0)
-
-                # Convert to PIL Image
-                img_data = pix.tobytes()
-                pil_img = Image.open(io.BytesIO(img_data))
-
-                # Resize if too large (Downsampling)
-                if pil_img.width > max_width:
-                    ratio = max_width / float(pil_img.width)
-                    new_height = int(float(pil_img.height) * ratio)
-                    pil_img = pil_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-                # Compress to JPEG
-                buffer = io.BytesIO()
-                pil_img.save(buffer, format="JPEG", quality=quality, optimize=True)
-                new_img_data = buffer.getvalue()
-
-                # Update the PDF stream
-                doc.update_stream(xref, new_img_data)
-                
-            except Exception as e:
-                print(f"Skipping image {xref}: {e}")
+    for xref in sorted(img_xrefs):
+        reason = _precheck_image(doc, xref, quality, max_width)
+        if reason:
+            stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+            continue
+        try:
+            # Plain JPEGs are handed over as-is and decoded by the worker
+            if doc.xref_get_key(xref, "Filter")[1] == "/DCTDecode" and doc.xref_get_key(xref, "Decode")[0] == "null":
+                yield xref, doc.xref_stream_raw(xref), quality, max_width
                 continue
 
+            # Everything else is decoded once here and passed on as raw samples
+            pix = fitz.Pixmap(doc, xref)
+
+            # Handle CMYK/Alpha conversion
+            if pix.n - pix.alpha > 3:
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+
+            yield xref, (pix.width, pix.height, pix.n, pix.samples), quality, max_width
+        except Exception as e:
+            print(f"Skipping image {xref}: {e}")
+            stats["skipped"]["failed"] = stats["skipped"].get("failed", 0) + 1
+
+# --- HELPER: Intelligent Image Compressor ---
+def compress_images_in_pdf(doc, quality=50, max_width=1024, workers=1):
+    """
+    Iterates through the PDF, finds images, downscales/compresses them,
+    and replaces the original streams. With workers > 1 the decode/resize/encode
+    step is spread over a process pool; results are identical to the serial run.
+    Returns how many images were recompressed and how many were skipped, by reason.
+    """
+    stats = {"recompressed": 0, "skipped": {}}
+    jobs = list(_extract_image_jobs(doc, quality, max_width, stats))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(pool.map(_recompress_image, jobs, chunksize=chunksize))
+    else:
+        results = [_recompress_image(job) for job in jobs]
+
+    # Update the PDF streams in xref order
+    for xref, result in results:
+        if isinstance(result, str):
+            stats["skipped"][result] = stats["skipped"].get(result, 0) + 1
+            continue
+        if isinstance(result, Exception):
+            print(f"Skipping image {xref}: {result}")
+            stats["skipped"]["failed"] = stats["skipped"].get("failed", 0) + 1
+            continue
+        _replace_image_stream(doc, xref, *result)
+        stats["recompressed"] += 1
+
+    return stats
+
 # --- ROUTES (Previous routes kept same, showing compress_pdf update) ---
 
 @app.route('/convert-to-word', methods=['POST'])
@@ -215,12 +321,18 @@ def compress_pdf():
         original_size = os.path.getsize(pdf_path)
 
         level = request.form.get('level', 'recommended') 
+
+        # Number of worker processes for image recompression (capped by config)
+        workers = request.form.get('workers', app.config['COMPRESS_WORKERS'], type=int)
+        workers = max(1, min(workers, app.config['COMPRESS_WORKERS']))
+
         base_name = filename.rsplit('.', 1)[0]
         output_filename = f"{base_name}_compressed.pdf"
         output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], output_filename)
 
         try:
             doc = fitz.open(pdf_path)
+            images = {"recompressed": 0, "skipped": {}}
             
             # LOGIC: 
             # If 'extreme': Downsample images aggressively + Max Garbage Collection
@@ -229,12 +341,12 @@ def compress_pdf():
             
             if level == 'extreme':
                 # Aggressively shrink images inside the PDF
-                compress_images_in_pdf(doc, quality=30, max_width=800)
+                images = compress_images_in_pdf(doc, quality=30, max_width=800, workers=workers)
                 doc.save(output_path, garbage=4, deflate=True, clean=True)
                 
             elif level == 'recommended':
                 # Moderate image shrink + cleanup
-                compress_images_in_pdf(doc, quality=60, max_width=1600)
+                images = compress_images_in_pdf(doc, quality=60, max_width=1600, workers=workers)
                 doc.save(output_path, garbage=4, deflate=True)
                 
             else: # 'less'
@@ -259,7 +371,8 @@ def compress_pdf():
             return jsonify({
                 'message': 'Compression successful',
                 'download_url': f'/download/{output_filename}',
-                'size_comparison': size_comparison
+                'size_comparison': size_comparison,
+                'images': images
             })
 
         except Exception as e:
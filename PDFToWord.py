@@ -1,7 +1,17 @@
 import os
+import io
+import copy
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
 from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
 from pdf2docx import Converter
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
@@ -15,6 +25,106 @@ os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
+# Parallel conversion: pdf2docx multi-processing below WORD_STITCH_MIN_PAGES, page ranges stitched together above
+app.config['WORD_WORKERS'] = int(os.environ.get('WORD_WORKERS', os.cpu_count() or 1))
+app.config['WORD_STITCH_MIN_PAGES'] = int(os.environ.get('WORD_STITCH_MIN_PAGES', 100))
+
+# --- HELPER: Convert one page range to its own .docx (also runs inside pool workers) ---
+def _convert_docx_range(job):
+    pdf_path, docx_path, start, end = job
+    cv = Converter(pdf_path)
+    try:
+        cv.convert(docx_path, start=start, end=end)
+    finally:
+        cv.close()
+    return docx_path
+
+# --- HELPER: pdf2docx multi-processing, isolated in its own process and directory ---
+def _convert_docx_multiprocess(job):
+    # pdf2docx writes its per-process page JSON into the working directory,
+    # so each request gets a private one
+    pdf_path, docx_path, start, end, cpu, workdir = job
+    os.chdir(workdir)
+    cv = Converter(pdf_path)
+    try:
+        cv.convert(docx_path, start=start, end=end, multi_processing=True, cpu_count=cpu)
+    finally:
+        cv.close()
+    return docx_path
+
+_R_NS = qn('r:id')[:-len('id')]  # '{...relationships}'
+
+# --- HELPER: Re-point image and link relationships at the destination document ---
+def _relink(element, src_part, dst_part):
+    for node in element.iter():
+        for name, value in node.attrib.items():
+            if not name.startswith(_R_NS) or value not in src_part.rels:
+                continue
+            rel = src_part.rels[value]
+            if rel.is_external:
+                new_id = dst_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                new_id, _ = dst_part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+            else:
+                new_id = dst_part.relate_to(rel.target_part, rel.reltype)
+            node.set(name, new_id)
+
+# --- HELPER: Stitch .docx parts together in order ---
+def stitch_docx(part_paths, output_path):
+    master = Document(part_paths[0])
+    body = master.element.body
+    for path in part_paths[1:]:
+        part = Document(path)
+        sect = body.find(qn('w:sectPr'))
+        # The closing section so far becomes a section break on its last paragraph
+        last = sect.getprevious()
+        if last is None or last.tag != qn('w:p') or last.find(f"{qn('w:pPr')}/{qn('w:sectPr')}") is not None:
+            last = OxmlElement('w:p')
+            sect.addprevious(last)
+        p_pr = last.find(qn('w:pPr'))
+        if p_pr is None:
+            p_pr = OxmlElement('w:pPr')
+            last.insert(0, p_pr)
+        p_pr.append(copy.deepcopy(sect))
+        for child in part.element.body.iterchildren():
+            if child.tag == qn('w:sectPr'):
+                continue
+            element = copy.deepcopy(child)
+            _relink(element, part.part, master.part)
+            sect.addprevious(element)
+        part_sect = part.element.body.find(qn('w:sectPr'))
+        if part_sect is not None:
+            body.replace(sect, copy.deepcopy(part_sect))
+    # Drawing ids must be unique across the whole document
+    for i, doc_pr in enumerate(body.iter(qn('wp:docPr')), 1):
+        doc_pr.set('id', str(i))
+    master.save(output_path)
+
+# --- HELPER: Serial, multi-process or stitched conversion of pages [start, end) ---
+def convert_pdf_to_docx(pdf_path, docx_path, start=0, end=None, workers=1, stitch_min_pages=100):
+    with fitz.open(pdf_path) as doc:
+        end = len(doc) if end is None else min(end, len(doc))
+    if start >= end:
+        raise ValueError('No pages selected')
+    if workers <= 1 or end - start <= 1:
+        _convert_docx_range((pdf_path, docx_path, start, end))
+        return 'serial'
+    workdir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    try:
+        if end - start < stitch_min_pages:
+            job = (os.path.abspath(pdf_path), os.path.abspath(docx_path), start, end, workers, workdir)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                pool.submit(_convert_docx_multiprocess, job).result()
+            return 'multiprocess'
+        chunk = max(10, -(-(end - start) // (workers * 2)))
+        jobs = [(pdf_path, os.path.join(workdir, f"part_{i}.docx"), i, min(i + chunk, end))
+                for i in range(start, end, chunk)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            part_paths = list(pool.map(_convert_docx_range, jobs))
+        stitch_docx(part_paths, docx_path)
+        return 'stitched'
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
 
 @app.route('/convert-to-word', methods=['POST'])
 def convert_to_word():
@@ -36,17 +146,25 @@ def convert_to_word():
         word_filename = filename.rsplit('.', 1)[0] + '.docx'
         word_path = os.path.join(app.config['DOWNLOAD_FOLDER'], word_filename)
 
+        # 3. Page range (1-based, inclusive) and worker count
+        start = max(request.form.get('start', 1, type=int), 1)
+        end = request.form.get('end', type=int)
+        workers = request.form.get('workers', app.config['WORD_WORKERS'], type=int)
+        workers = max(1, min(workers, app.config['WORD_WORKERS']))
+
         try:
-            # 3. Perform the Conversion
-            cv = Converter(pdf_path)
-            cv.convert(word_path, start=0, end=None)
-            cv.close()
+            # 4. Perform the Conversion
+            mode = convert_pdf_to_docx(pdf_path, word_path, start=start - 1, end=end, workers=workers,
+                                       stitch_min_pages=app.config['WORD_STITCH_MIN_PAGES'])
 
-            # 4. Return the download URL
+            # 5. Return the download URL
             return jsonify({
                 'message': 'Conversion successful',
-                'download_url': f'/download/{word_filename}'
+                'download_url': f'/download/{word_filename}',
+                'mode': mode
             })
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -4,6 +4,7 @@ import fitz  # PyMuPDF
 import pdfplumber
 import pandas as pd
 import zipfile  # NEW: For zipping split files
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
 from pdf2docx import Converter
@@ -22,6 +23,8 @@ os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
+# Max processes used to split PDFs (1 = serial)
+app.config['SPLIT_WORKERS'] = int(os.environ.get('SPLIT_WORKERS', os.cpu_count() or 1))
 
 # --- HELPER FUNCTIONS ---
 def convert_pdf_to_pptx_logic(pdf_path, pptx_path):
@@ -54,6 +57,43 @@ def convert_pdf_to_excel_logic(pdf_path, excel_path):
                 df = pd.DataFrame(["No detected tables in this PDF."])
                 df.to_excel(writer, sheet_name="Info", index=False, header=False)
 
+# --- HELPER: Split one shard of parts (also runs inside pool workers) ---
+def _split_shard(job):
+    """
+    Writes every (name, first, last) part of a shard with a single open of the source.
+    garbage=3 leaves each part with only the objects its own pages reference.
+    """
+    pdf_path, parts, subset_fonts = job
+    src = fitz.open(pdf_path)
+    out = []
+    for name, first, last in parts:
+        part = fitz.open()
+        part.insert_pdf(src, from_page=first, to_page=last)
+        if subset_fonts:
+            part.subset_fonts()
+        out.append((name, part.tobytes(garbage=3, deflate=True)))
+        part.close()
+    src.close()
+    return out
+
+# --- HELPER: Single-pass splitter ---
+def split_pdf_parts(pdf_path, parts, workers=1, subset_fonts=False):
+    """
+    Yields (name, pdf_bytes) for each (name, first_page, last_page) part, in order.
+    Parts are grouped into small contiguous shards, each handled by a pool worker.
+    """
+    if not parts:
+        return
+    shard_size = max(1, min(64, len(parts) // (max(workers, 1) * 4)))
+    jobs = [(pdf_path, parts[i:i + shard_size], subset_fonts) for i in range(0, len(parts), shard_size)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            for shard in pool.map(_split_shard, jobs):
+                yield from shard
+    else:
+        for job in jobs:
+            yield from _split_shard(job)
+
 # --- ROUTES ---
 
 @app.route('/convert-to-word', methods=['POST'])
@@ -141,23 +181,23 @@ def split_pdf():
         zip_filename = f"{base_name}_split_files.zip"
         zip_path = os.path.join(app.config['DOWNLOAD_FOLDER'], zip_filename)
 
+        # Optional settings
+        subset_fonts = request.form.get('subset_fonts', '').lower() in ('1', 'true', 'yes', 'on')
+        workers = request.form.get('workers', app.config['SPLIT_WORKERS'], type=int)
+        workers = max(1, min(workers, app.config['SPLIT_WORKERS']))
+
         try:
             doc = fitz.open(pdf_path)
+            total_pages = len(doc)
+            doc.close()
+
+            # One part per page
+            parts = [(f"{base_name}_page_{page_num + 1}.pdf", page_num, page_num) for page_num in range(total_pages)]
+
             # Create a ZIP file
             with zipfile.ZipFile(zip_path, 'w') as zipf:
-                # Iterate over every page
-                for page_num in range(len(doc)):
-                    new_doc = fitz.open()
-                    new_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-                    
-                    # Save page to memory bytes
-                    pdf_bytes = new_doc.tobytes()
-                    new_doc.close()
-                    
-                    # Write bytes to zip with a specific name
-                    zipf.writestr(f"{base_name}_page_{page_num + 1}.pdf", pdf_bytes)
-            
-            doc.close()
+                for part_name, pdf_bytes in split_pdf_parts(pdf_path, parts, workers=workers, subset_fonts=subset_fonts):
+                    zipf.writestr(part_name, pdf_bytes)
             return jsonify({
                 'message': 'Split successful',
                 'download_url': f'/download/{zip_filename}'
@@ -0,0 +1,122 @@
+"""Benchmark and compare the PyMuPDF and pdfplumber table engines cell by cell.
+
+Usage:
+    python benchmarks/bench_excel.py [input.pdf | fixture_dir ...] [--pages 200]
+
+Without inputs a synthetic bank statement is generated: ruled transaction
+tables with a narrative page every tenth page. For each file both engines
+are timed, and every table pdfplumber finds is compared with the table at
+the same position from PyMuPDF. Cells are compared after whitespace
+normalisation. Each engine is also timed with a fresh template directory,
+where the first page of a layout is detected and the rest are cut along its
+stored columns; those tables are checked against full detection.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask_app import iter_page_tables  # noqa: E402
+
+
+def make_statement(path, pages):
+    doc = fitz.open()
+    widths = [70, 250, 90, 90]
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((36, 50), f"Account statement - page {i + 1}", fontname="hebo", fontsize=14)
+        if i % 10 == 9:
+            for line in range(40):
+                page.insert_text((36, 90 + line * 16), "Terms and conditions apply to all accounts held with us. " * 2, fontsize=8)
+            continue
+        top = 80
+        for row in range(30):
+            x = 36
+            cells = ["Date", "Description", "Amount", "Balance"] if row == 0 else \
+                [f"2024-{row % 12 + 1:02d}-{row % 28 + 1:02d}", f"Payment {i * 30 + row}", f"{row * 12.5:.2f}", f"{1000 + row * 7.25:.2f}"]
+            for width, text in zip(widths, cells):
+                page.draw_rect(fitz.Rect(x, top, x + width, top + 20), color=(0, 0, 0), width=0.5)
+                page.insert_text((x + 3, top + 14), text, fontsize=9)
+                x += width
+            top += 20
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+
+
+def extract(pdf_path, engine, template_dir=None):
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    start = time.perf_counter()
+    pages = {i: tables or [] for i, tables, _ in
+             iter_page_tables(pdf_path, list(range(page_count)), engine, template_dir=template_dir)}
+    return pages, time.perf_counter() - start
+
+
+def normalise(cell):
+    return " ".join((cell or "").split())
+
+
+def compare(reference, candidate):
+    """Return (tables matched, tables missing, cells equal, cells compared)."""
+    matched = missing = equal = compared = 0
+    for page, tables in reference.items():
+        others = candidate.get(page, [])
+        for j, table in enumerate(tables):
+            if j >= len(others):
+                missing += 1
+                continue
+            matched += 1
+            for r, row in enumerate(table):
+                other_row = others[j][r] if r < len(others[j]) else []
+                for c, cell in enumerate(row):
+                    other = other_row[c] if c < len(other_row) else None
+                    compared += 1
+                    equal += normalise(cell) == normalise(other)
+    return matched, missing, equal, compared
+
+
+def collect(inputs):
+    for item in inputs:
+        if os.path.isdir(item):
+            yield from sorted(os.path.join(item, name) for name in os.listdir(item) if name.lower().endswith(".pdf"))
+        else:
+            yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*")
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = list(collect(args.inputs))
+        if not inputs:
+            inputs = [os.path.join(tmp, "statement.pdf")]
+            make_statement(inputs[0], args.pages)
+        for pdf_path in inputs:
+            plumber, plumber_seconds = extract(pdf_path, "pdfplumber")
+            mupdf, mupdf_seconds = extract(pdf_path, "pymupdf")
+            matched, missing, equal, compared = compare(plumber, mupdf)
+            extra = sum(len(t) for t in mupdf.values()) - matched
+            print(f"{pdf_path}: {len(plumber)} pages")
+            print(f"  pdfplumber {plumber_seconds:8.2f}s  {sum(len(t) for t in plumber.values())} tables")
+            print(f"  pymupdf    {mupdf_seconds:8.2f}s  {sum(len(t) for t in mupdf.values())} tables"
+                  f"  ({plumber_seconds / max(mupdf_seconds, 1e-9):.1f}x)")
+            print(f"  tables matched {matched}, missing in pymupdf {missing}, only in pymupdf {extra}")
+            if compared:
+                print(f"  cells equal {equal}/{compared} ({100 * equal / compared:.2f}%)")
+            for engine, detected, seconds in (("pdfplumber", plumber, plumber_seconds), ("pymupdf", mupdf, mupdf_seconds)):
+                with tempfile.TemporaryDirectory() as template_dir:
+                    templated, templated_seconds = extract(pdf_path, engine, template_dir)
+                same = sum(templated.get(page) == tables for page, tables in detected.items())
+                print(f"  {engine + ' templates':<22} {templated_seconds:8.2f}s  ({seconds / max(templated_seconds, 1e-9):.1f}x)"
+                      f"  pages same as detection {same}/{len(detected)}")
+
+
+if __name__ == "__main__":
+    main()
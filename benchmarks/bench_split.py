@@ -0,0 +1,85 @@
+"""Benchmark the single-pass splitter against the old per-page insert_pdf loop.
+
+Usage:
+    python benchmarks/bench_split.py [input.pdf] [--pages 2000] [--workers 4]
+
+Without an input file a synthetic ledger is generated, with the same fonts
+and logo on every page.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask_app import split_pdf_parts  # noqa: E402
+
+
+def make_ledger(path, pages):
+    logo = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 120), False)
+    logo.clear_with(180)
+    logo_png = logo.tobytes("png")
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(36, 36, 136, 96), stream=logo_png)
+        page.insert_text((36, 140), f"Ledger page {i + 1}", fontname="tiro", fontsize=16)
+        for row in range(30):
+            page.insert_text((36, 170 + row * 20), f"{row:03d}  Entry {i * 30 + row}  {row * 13.7:10.2f}", fontname="cour")
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+
+
+def old_loop(pdf_path):
+    doc = fitz.open(pdf_path)
+    total = 0
+    for i in range(len(doc)):
+        new_doc = fitz.open()
+        new_doc.insert_pdf(doc, from_page=i, to_page=i)
+        total += len(new_doc.tobytes())
+        new_doc.close()
+    doc.close()
+    return total
+
+
+def new_splitter(pdf_path, workers):
+    with fitz.open(pdf_path) as doc:
+        parts = [(f"page_{i + 1}.pdf", i, i) for i in range(len(doc))]
+    return sum(len(data) for _, data in split_pdf_parts(pdf_path, parts, workers=workers))
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    size = fn(*args)
+    seconds = time.perf_counter() - start
+    print(f"{label:<28} {seconds:8.2f}s  {size / 1024 / 1024:8.2f} MB of parts")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "ledger.pdf")
+            make_ledger(pdf_path, args.pages)
+        with fitz.open(pdf_path) as doc:
+            print(f"{pdf_path}: {len(doc)} pages, {os.path.getsize(pdf_path) / 1024 / 1024:.2f} MB")
+
+        baseline = timed("per-page loop", old_loop, pdf_path)
+        timed("splitter, 1 worker", new_splitter, pdf_path, 1)
+        if args.workers > 1:
+            parallel = timed(f"splitter, {args.workers} workers", new_splitter, pdf_path, args.workers)
+            print(f"speedup vs loop: {baseline / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark the text-flow Word mode against the pdf2docx layout converter.
+
+Usage:
+    python benchmarks/bench_word.py [input.pdf] [--pages 50]
+
+Without an input file a synthetic contract is generated: a title, numbered
+section headings, and body paragraphs with bold and italic phrases.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from docx import Document
+from pdf2docx import Converter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask_app import convert_pdf_to_docx_text  # noqa: E402
+
+CLAUSE = ("The Supplier shall deliver the Goods in accordance with the Specification and the "
+          "delivery schedule agreed in writing between the parties, and shall notify the Customer "
+          "without delay of any circumstance that may affect delivery. ")
+
+
+def make_contract(path, pages):
+    doc = fitz.open()
+    section = 0
+    for i in range(pages):
+        page = doc.new_page()
+        y = 72
+        if i == 0:
+            page.insert_text((72, y), "MASTER SUPPLY AGREEMENT", fontname="hebo", fontsize=20)
+            y += 40
+        for _ in range(3):
+            section += 1
+            page.insert_text((72, y), f"{section}. Obligations of the parties", fontname="hebo", fontsize=14)
+            y += 24
+            box = fitz.Rect(72, y, page.rect.width - 72, y + 150)
+            page.insert_textbox(box, CLAUSE * 4, fontname="helv", fontsize=10)
+            page.insert_text((72, y + 160), "Notwithstanding the above,", fontname="heit", fontsize=10)
+            y += 190
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+
+
+def layout_mode(pdf_path, docx_path):
+    cv = Converter(pdf_path)
+    cv.convert(docx_path)
+    cv.close()
+
+
+def timed(label, fn, pdf_path, docx_path):
+    start = time.perf_counter()
+    fn(pdf_path, docx_path)
+    seconds = time.perf_counter() - start
+    paragraphs = sum(1 for p in Document(docx_path).paragraphs if p.text.strip())
+    print(f"{label:<16} {seconds:8.2f}s  {os.path.getsize(docx_path) / 1024:8.1f} KB  {paragraphs} paragraphs")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # pdf2docx logs every page
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "contract.pdf")
+            make_contract(pdf_path, args.pages)
+        with fitz.open(pdf_path) as doc:
+            print(f"{pdf_path}: {len(doc)} pages")
+
+        layout = timed("pdf2docx layout", layout_mode, pdf_path, os.path.join(tmp, "layout.docx"))
+        text = timed("text mode", convert_pdf_to_docx_text, pdf_path, os.path.join(tmp, "text.docx"))
+        print(f"speedup: {layout / text:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,43 @@
 import os
+import sys
+import copy
+import multiprocessing
+import shutil
 import io
+import re
+import struct
+import bisect
+import hashlib
+import secrets
+import json
 import zipfile
+import zlib
+import tempfile
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import pdfplumber
-import pandas as pd
 from PIL import Image
-from flask import Flask, request, send_file, jsonify, render_template, url_for
+from openpyxl import Workbook
+from flask import Flask, Response, request, send_file, send_from_directory, jsonify, render_template, url_for, g
 from flask_cors import CORS
 from pdf2docx import Converter
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt as DocxPt
 from pptx import Presentation
-from pptx.util import Inches
+from pptx.dml.color import RGBColor
+from pptx.enum.shapes import MSO_CONNECTOR, MSO_SHAPE
+from pptx.util import Inches, Pt
 from werkzeug.utils import secure_filename
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 CORS(app)
@@ -22,12 +49,319 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
 UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads')
 DOWNLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'downloads')
+THUMBNAIL_FOLDER = os.path.join(PROJECT_ROOT, 'thumbnails')
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
+# Upper bound for the image recompression process pool (1 = serial)
+app.config['COMPRESS_WORKERS'] = int(os.environ.get('COMPRESS_WORKERS', os.cpu_count() or 1))
+# Uploads up to this size stay in memory; larger ones are spooled to their own temp file
+app.config['UPLOAD_SPOOL_MAX_MB'] = int(os.environ.get('UPLOAD_SPOOL_MAX_MB', 4))
+# Process pool for /merge-pdfs; batches of at least MERGE_TREE_MIN_SOURCES files are merged as a tree
+app.config['MERGE_WORKERS'] = int(os.environ.get('MERGE_WORKERS', os.cpu_count() or 1))
+app.config['MERGE_TREE_MIN_SOURCES'] = int(os.environ.get('MERGE_TREE_MIN_SOURCES', 16))
+# Process pool for /split-pdf
+app.config['SPLIT_WORKERS'] = int(os.environ.get('SPLIT_WORKERS', os.cpu_count() or 1))
+# Bounded-memory compression: used automatically for uploads above the threshold
+app.config['COMPRESS_BOUNDED_THRESHOLD_MB'] = int(os.environ.get('COMPRESS_BOUNDED_THRESHOLD_MB', 512))
+app.config['COMPRESS_MAX_RSS_MB'] = int(os.environ.get('COMPRESS_MAX_RSS_MB', 1024))
+# COMPRESS_BATCH_MB caps the decoded size of the images recompressed between two incremental saves
+app.config['COMPRESS_BATCH_MB'] = int(os.environ.get('COMPRESS_BATCH_MB', 128))
+# Process pool for rendering pages in /convert-to-ppt
+app.config['PPT_WORKERS'] = int(os.environ.get('PPT_WORKERS', os.cpu_count() or 1))
+# Process pool for table extraction in /convert-to-excel
+app.config['EXCEL_WORKERS'] = int(os.environ.get('EXCEL_WORKERS', os.cpu_count() or 1))
+# Learned table regions for recurring layouts, used by /convert-to-excel with use_templates
+app.config['TABLE_TEMPLATE_FOLDER'] = os.path.join(PROJECT_ROOT, 'table_templates')
+os.makedirs(app.config['TABLE_TEMPLATE_FOLDER'], exist_ok=True)
+# /convert-to-word: pdf2docx multi-processing below WORD_STITCH_MIN_PAGES, page ranges stitched together above
+app.config['WORD_WORKERS'] = int(os.environ.get('WORD_WORKERS', os.cpu_count() or 1))
+app.config['WORD_STITCH_MIN_PAGES'] = int(os.environ.get('WORD_STITCH_MIN_PAGES', 100))
+# Per-page budgets for /convert-to-word (0 = off); a page over budget is replaced by an image of it
+app.config['WORD_PAGE_TIMEOUT'] = float(os.environ.get('WORD_PAGE_TIMEOUT', 0))
+app.config['WORD_PAGE_MAX_MB'] = int(os.environ.get('WORD_PAGE_MAX_MB', 0))
+# /convert-to-images: process pool, PNG band size, and the pixel cap for JPEG/WebP pages (larger requests get a 400)
+app.config['IMAGES_WORKERS'] = int(os.environ.get('IMAGES_WORKERS', os.cpu_count() or 1))
+app.config['IMAGES_BAND_MB'] = int(os.environ.get('IMAGES_BAND_MB', 16))
+app.config['IMAGES_MAX_MEGAPIXELS'] = int(os.environ.get('IMAGES_MAX_MEGAPIXELS', 40))
+# Organize page previews: PNGs are kept in memory per process, then spilled with the source PDFs to THUMBNAIL_FOLDER,
+# which all server processes share within THUMBNAIL_DISK_MB; THUMBNAIL_MAX_DOCS is the open documents per process
+app.config['THUMBNAIL_MEMORY_MB'] = int(os.environ.get('THUMBNAIL_MEMORY_MB', 64))
+app.config['THUMBNAIL_DISK_MB'] = int(os.environ.get('THUMBNAIL_DISK_MB', 512))
+app.config['THUMBNAIL_MAX_DOCS'] = int(os.environ.get('THUMBNAIL_MAX_DOCS', 16))
+
+# --- UPLOADS ---
+
+class SpooledUpload:
+    """An uploaded file held in memory while small and in its own temp file under UPLOAD_FOLDER once large.
+
+    Routes get these from get_upload()/get_uploads(); they are closed, and any temp file deleted, when the
+    request ends, so concurrent uploads with the same name never touch each other.
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, storage, max_memory):
+        self.filename = secure_filename(storage.filename) or 'upload.pdf'
+        self.path, self.data = None, None
+        head = storage.stream.read(max_memory + 1)
+        if len(head) <= max_memory:
+            self.data, self.size = head, len(head)
+            return
+        self.path = self._new_temp_path()
+        with open(self.path, 'wb') as out:
+            out.write(head)
+            del head
+            shutil.copyfileobj(storage.stream, out, self.CHUNK_SIZE)
+        self.size = os.path.getsize(self.path)
+
+    def _new_temp_path(self):
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(self.filename)[1] or '.pdf', dir=app.config['UPLOAD_FOLDER'])
+        os.close(fd)
+        return path
+
+    def open_pdf(self):
+        # Spooled files are opened by path: MuPDF reads them on demand instead of copying them into memory
+        return fitz.open(self.path) if self.path else fitz.open("pdf", self.data)
+
+    def as_path(self):
+        """Path of the upload on disk, writing in-memory uploads out first for libraries that need a file."""
+        if self.path is None:
+            self.path = self._new_temp_path()
+            with open(self.path, 'wb') as out: out.write(self.data)
+            self.data = None
+        return self.path
+
+    def digest(self):
+        """SHA-256 hex digest of the upload's bytes."""
+        h = hashlib.sha256()
+        if self.path is None: h.update(self.data)
+        else:
+            with open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''): h.update(chunk)
+        return h.hexdigest()
+
+    def copy_to(self, dest):
+        if self.path: shutil.copyfile(self.path, dest)
+        else:
+            with open(dest, 'wb') as out: out.write(self.data)
+
+    def close(self):
+        self.data = None
+        if self.path:
+            try: os.remove(self.path)
+            except OSError as e: print(f"Could not remove upload {self.path}: {e}")
+            self.path = None
+
+def _track_upload(upload):
+    g.setdefault('uploads', []).append(upload)
+    return upload
+
+def get_upload(field='file'):
+    storage = request.files.get(field)
+    if storage is None or storage.filename == '': return None
+    return _track_upload(SpooledUpload(storage, app.config['UPLOAD_SPOOL_MAX_MB'] * 1024 * 1024))
+
+def get_uploads(field='files'):
+    max_memory = app.config['UPLOAD_SPOOL_MAX_MB'] * 1024 * 1024
+    return [_track_upload(SpooledUpload(storage, max_memory)) for storage in request.files.getlist(field) if storage.filename]
+
+def release_upload_after(chunks, upload):
+    """Hand an upload over to a streamed response: it is closed after the last chunk instead of at teardown."""
+    g.uploads.remove(upload)
+    def generate():
+        try:
+            yield from chunks
+        finally:
+            upload.close()
+    return generate()
+
+def download_path(filename):
+    """Where a request writes an output called filename.
+
+    Each request gets its own unguessable directory under DOWNLOAD_FOLDER, so two uploads of the same
+    name neither overwrite nor can fetch each other's results; the name itself stays the download name.
+    """
+    if 'download_dir' not in g:
+        g.download_dir = os.path.join(app.config['DOWNLOAD_FOLDER'], secrets.token_hex(16))
+        os.makedirs(g.download_dir)
+    return os.path.join(g.download_dir, filename)
+
+def download_url(path):
+    return '/download/' + os.path.relpath(path, app.config['DOWNLOAD_FOLDER']).replace(os.sep, '/')
+
+@app.teardown_request
+def _close_uploads(exc):
+    for upload in g.pop('uploads', []): upload.close()
+    # Streamed and failed requests leave their output directory empty
+    download_dir = g.pop('download_dir', None)
+    if download_dir:
+        try: os.rmdir(download_dir)
+        except OSError: pass
+
+# --- THUMBNAILS ---
+
+class ThumbnailCache:
+    """LRU cache of rendered page thumbnails keyed by (document hash, page, scale).
+
+    PNGs are rendered lazily on first request. Source PDFs and spilled PNGs live in cache_dir, which every
+    process of the server shares: documents are named by their SHA-256, so a page can be rendered by any
+    worker, not only the one that took the upload. Each process keeps its own in-memory LRU of PNGs and
+    of open documents (up to max_docs). Once the files in cache_dir pass max_disk, the least recently
+    used by mtime are removed, whichever process wrote them.
+    """
+    def __init__(self, cache_dir, max_memory, max_disk, max_docs):
+        self.doc_dir = os.path.join(cache_dir, 'docs')
+        self.page_dir = os.path.join(cache_dir, 'pages')
+        os.makedirs(self.doc_dir, exist_ok=True)
+        os.makedirs(self.page_dir, exist_ok=True)
+        self.max_memory, self.max_disk, self.max_docs = max_memory, max_disk, max_docs
+        self._memory, self._memory_bytes = OrderedDict(), 0
+        self._docs = OrderedDict()  # doc_id -> open fitz.Document
+        # MuPDF documents aren't thread-safe, so lookups and renders share one lock
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _doc_path(self, doc_id):
+        return os.path.join(self.doc_dir, f"{doc_id}.pdf")
+
+    def _page_path(self, key):
+        return os.path.join(self.page_dir, "{}_{}_{}.png".format(*key))
+
+    def add_document(self, upload):
+        """Store an uploaded PDF for rendering; returns (doc_id, page_count). Re-uploads reuse the stored copy."""
+        doc_id = upload.digest()
+        path = self._doc_path(doc_id)
+        if os.path.exists(path): _touch(path)
+        else:
+            if upload.size > self.max_disk: raise ValueError('File is too large to preview')
+            # Written under a temp name and renamed, so no process ever opens half a copy; the copy runs
+            # outside the lock so renders aren't held up
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.doc_dir)
+            os.close(fd)
+            try:
+                upload.copy_to(tmp_path)
+                with fitz.open(tmp_path) as doc:
+                    if not doc.is_pdf: raise ValueError('Not a PDF file')
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            self._trim_disk(keep=path)
+        with self._lock:
+            doc = self._open(doc_id)
+            if doc is None: raise RuntimeError('The preview store is full, try again')
+            return doc_id, len(doc)
+
+    def _open(self, doc_id):
+        # Called under the lock; None if no process has the document on disk
+        doc = self._docs.get(doc_id)
+        if doc is not None:
+            self._docs.move_to_end(doc_id)
+            return doc
+        try: doc = fitz.open(self._doc_path(doc_id))
+        except (fitz.FileNotFoundError, FileNotFoundError): return None
+        self._docs[doc_id] = doc
+        while len(self._docs) > self.max_docs: self._docs.popitem(last=False)[1].close()
+        return doc
+
+    def _disk_entries(self):
+        # (mtime, size, path) of every finished file; temp files being written are left alone
+        entries = []
+        for folder in (self.doc_dir, self.page_dir):
+            for entry in os.scandir(folder):
+                if entry.name.endswith('.tmp'): continue
+                try: st = entry.stat()
+                except FileNotFoundError: continue  # removed by another process meanwhile
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _trim_disk(self, keep=None):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk: break
+            if path == keep: continue
+            # A process with the document open keeps reading it after the unlink
+            try: os.remove(path)
+            except FileNotFoundError: pass
+            total -= size
+
+    def get(self, doc_id, page, scale):
+        """PNG bytes for a 0-based page; None if the document isn't stored. Raises ValueError for a bad page."""
+        key = (doc_id, page, scale)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            try:
+                with open(self._page_path(key), 'rb') as f: data = f.read()
+            except FileNotFoundError: pass
+            else:
+                _touch(self._page_path(key))
+                self.hits += 1
+                self._remember(key, data)
+                return data
+            doc = self._open(doc_id)
+            if doc is None: return None
+            if not 0 <= page < len(doc): raise ValueError(f'Page {page + 1} is out of range (1-{len(doc)})')
+            self.misses += 1
+            _touch(self._doc_path(doc_id))
+            data = doc[page].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False).tobytes("png")
+            self._remember(key, data)
+            return data
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        spilled = False
+        while self._memory_bytes > self.max_memory and len(self._memory) > 1:
+            old_key, old_data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            path = self._page_path(old_key)
+            if os.path.exists(path): continue  # another process spilled it already
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.page_dir)
+            with os.fdopen(fd, 'wb') as f: f.write(old_data)
+            os.replace(tmp_path, path)
+            spilled = True
+        if spilled: self._trim_disk()
+
+    def stats(self):
+        entries = self._disk_entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "open_documents": len(self._docs),
+                "disk_entries": len(entries),
+                "disk_bytes": sum(size for _, size, _ in entries),
+            }
+
+def _touch(path):
+    # mtime is the shared LRU clock; the file may have just been evicted by another process
+    try: os.utime(path)
+    except FileNotFoundError: pass
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+def get_thumbnail_cache():
+    """The process's ThumbnailCache, created on first use so importing this module touches no files."""
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache(THUMBNAIL_FOLDER, app.config['THUMBNAIL_MEMORY_MB'] * 1024 * 1024,
+                                              app.config['THUMBNAIL_DISK_MB'] * 1024 * 1024,
+                                              app.config['THUMBNAIL_MAX_DOCS'])
+        return _thumbnail_cache
 
 # --- HELPER FUNCTIONS ---
 
@@ -38,60 +372,1318 @@ def get_size_format(b, factor=1024, suffix="B"):
         b /= factor
     return f"{b:.2f}Y{suffix}"
 
-def compress_images_in_pdf(doc, quality=50, max_width=1024):
+def form_flag(name, default=False):
+    value = request.form.get(name)
+    if value is None: return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def form_workers(config_key):
+    """The 'workers' form field, defaulting to and capped at app.config[config_key]."""
+    limit = app.config[config_key]
+    return max(1, min(request.form.get('workers', limit, type=int), limit))
+
+def parse_size(value):
+    """Parses sizes like '2MB', '500 KB' or '1048576' into bytes; returns None if empty or invalid."""
+    if not value: return None
+    value = value.strip().upper().rstrip("B").strip()
+    factor = 1
+    for i, unit in enumerate(["K", "M", "G"]):
+        if value.endswith(unit):
+            value, factor = value[:-1].strip(), 1024 ** (i + 1)
+            break
+    try: return int(float(value) * factor)
+    except ValueError: return None
+
+_PIL_MODES = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}
+
+def _pixmap_to_pil(width, height, n, samples):
+    # Wraps the raw sample buffer directly, no PNG encode/decode round trip
+    mode = _PIL_MODES[n]
+    return Image.frombuffer(mode, (width, height), samples, "raw", mode, 0, 1)
+
+def _recompress_image(job):
+    """Decode, downscale and JPEG-encode one extracted image. Runs in pool workers too."""
+    xref, payload, quality, max_width = job
+    try:
+        if isinstance(payload, bytes):
+            pix = fitz.Pixmap(payload)
+            if pix.n - pix.alpha > 3: pix = fitz.Pixmap(fitz.csRGB, pix)
+            payload = (pix.width, pix.height, pix.n, pix.samples_mv)
+        width, height, n, samples = payload
+        if width < 100 or height < 100: return xref, "too_small"
+        pil_img = _pixmap_to_pil(width, height, n, samples)
+        if pil_img.width > max_width:
+            ratio = max_width / float(pil_img.width)
+            new_height = int(float(pil_img.height) * ratio)
+            pil_img = pil_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return xref, (buffer.getvalue(), pil_img.width, pil_img.height, pil_img.mode)
+    except Exception as e:
+        return xref, e
+
+def _replace_image_stream(doc, xref, jpeg_data, width, height, mode):
+    # The new stream is a baseline JPEG, so the image dictionary has to follow it
+    doc.update_stream(xref, jpeg_data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Decode", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if mode == "L" else "/DeviceRGB")
+
+def _image_int_key(doc, xref, key):
+    typ, val = doc.xref_get_key(xref, key)
+    return int(val) if typ == "int" else None
+
+def _precheck_image(doc, xref, quality, max_width):
+    """Return why an image can't get smaller from its dictionary alone, or None if it should be recompressed."""
+    if doc.xref_get_key(xref, "ImageMask")[1] == "true": return "mask"
+    width, height = _image_int_key(doc, xref, "Width"), _image_int_key(doc, xref, "Height")
+    if width and height and (width < 100 or height < 100): return "too_small"
+    filt = doc.xref_get_key(xref, "Filter")[1]
+    if _image_int_key(doc, xref, "BitsPerComponent") == 1 or "JBIG2Decode" in filt or "CCITTFaxDecode" in filt:
+        return "bilevel"
+    if filt == "/DCTDecode" and width and height and width <= max_width:
+        # Rough JPEG output size per pixel at this quality (q30 ~ 0.1, q60 ~ 0.2 bytes)
+        if len(doc.xref_stream_raw(xref)) / float(width * height) <= quality / 300.0: return "already_optimal"
+    return None
+
+def _extract_image_job(doc, xref, quality, max_width, stats):
+    reason = _precheck_image(doc, xref, quality, max_width)
+    if reason:
+        stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+        return None
+    try:
+        if doc.xref_get_key(xref, "Filter")[1] == "/DCTDecode" and doc.xref_get_key(xref, "Decode")[0] == "null":
+            # Plain JPEGs are handed over as-is and decoded by the worker
+            return xref, doc.xref_stream_raw(xref), quality, max_width
+        pix = fitz.Pixmap(doc, xref)
+        if pix.n - pix.alpha > 3: pix = fitz.Pixmap(fitz.csRGB, pix)
+        return xref, (pix.width, pix.height, pix.n, pix.samples), quality, max_width
+    except Exception as e:
+        print(f"Skipping image {xref}: {e}")
+        stats["skipped"]["failed"] = stats["skipped"].get("failed", 0) + 1
+        return None
+
+def _decoded_image_bytes(doc, xref, payload):
+    """Size of an extracted image once decoded; plain JPEGs are sized from their Width, Height and ColorSpace."""
+    if not isinstance(payload, bytes): return len(payload[3])
+    try:
+        width, height = int(doc.xref_get_key(xref, "Width")[1]), int(doc.xref_get_key(xref, "Height")[1])
+    except ValueError: return len(payload)
+    colorspace = doc.xref_get_key(xref, "ColorSpace")[1]
+    components = 1 if colorspace == "/DeviceGray" else 4 if colorspace == "/DeviceCMYK" else 3
+    return width * height * components
+
+def _image_xrefs(doc):
     img_xrefs = set()
     for page_num in range(len(doc)):
-        page = doc[page_num]
-        images = page.get_images()
-        for img in images:
-            xref = img[0]
-            if xref in img_xrefs: continue
-            img_xrefs.add(xref)
-            try:
-                pix = fitz.Pixmap(doc, xref)
-                if pix.width < 100 or pix.height < 100: continue
-                if pix.n - pix.alpha > 3: pix = fitz.Pixmap(fitz.csRGB, pix, 0)
-                img_data = pix.tobytes()
-                pil_img = Image.open(io.BytesIO(img_data))
-                if pil_img.width > max_width:
-                    ratio = max_width / float(pil_img.width)
-                    new_height = int(float(pil_img.height) * ratio)
-                    pil_img = pil_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                buffer = io.BytesIO()
-                pil_img.save(buffer, format="JPEG", quality=quality, optimize=True)
-                doc.update_stream(xref, buffer.getvalue())
-            except Exception as e:
-                print(f"Skipping image {xref}: {e}")
-
-def convert_pdf_to_pptx_logic(pdf_path, pptx_path):
+        for img in doc[page_num].get_images():
+            img_xrefs.add(img[0])
+    return sorted(img_xrefs)
+
+def _extract_image_jobs(doc, quality, max_width, stats):
+    for xref in _image_xrefs(doc):
+        job = _extract_image_job(doc, xref, quality, max_width, stats)
+        if job: yield job
+
+def _run_image_jobs(jobs, workers=1, pool=None):
+    if pool is None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return _run_image_jobs(jobs, workers, pool)
+    if pool is not None:
+        return list(pool.map(_recompress_image, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return [_recompress_image(job) for job in jobs]
+
+def _ordered_pool_results(fn, jobs, workers):
+    """Yield the items of each fn(job) list from a process pool, in job order.
+
+    Only about two jobs per worker are in flight at a time, so output starts with the first job and a
+    slow consumer never makes finished results pile up in memory.
+    """
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(fn, job))
+            if len(pending) > workers * 2: yield from pending.popleft().result()
+        while pending: yield from pending.popleft().result()
+
+def _apply_image_results(doc, results, stats):
+    for xref, result in results:
+        if isinstance(result, str):
+            stats["skipped"][result] = stats["skipped"].get(result, 0) + 1
+            continue
+        if isinstance(result, Exception):
+            print(f"Skipping image {xref}: {result}")
+            stats["skipped"]["failed"] = stats["skipped"].get("failed", 0) + 1
+            continue
+        _replace_image_stream(doc, xref, *result)
+        stats["recompressed"] += 1
+    return stats
+
+def _saved_stream_size(doc, xref):
+    # Unfiltered streams get deflated on save, so count their compressed size
+    raw = doc.xref_stream_raw(xref)
+    return len(zlib.compress(raw)) if doc.xref_get_key(xref, "Filter")[0] == "null" else len(raw)
+
+_INDIRECT_REF = re.compile(r"\b(\d+) (\d+) R\b")
+
+def _object_digest(doc, xref, memo):
+    """Hash an object's dictionary and stream, with indirect references replaced by the referenced objects' digests."""
+    if xref in memo: return memo[xref]
+    memo[xref] = f"cycle:{xref}"
+    text = _INDIRECT_REF.sub(lambda m: _object_digest(doc, int(m.group(1)), memo), doc.xref_object(xref, compressed=True))
+    digest = hashlib.sha256(text.encode())
+    if doc.xref_is_stream(xref): digest.update(doc.xref_stream_raw(xref))
+    memo[xref] = digest.hexdigest()
+    return memo[xref]
+
+def _set_xobject_ref(doc, holder, name, target):
+    # xref_set_key can't write through indirect objects, so walk to the dictionary that owns the entry
+    path = ""
+    for key in ("Resources", "XObject"):
+        typ, val = doc.xref_get_key(holder, path + key)
+        if typ == "xref": holder, path = int(val.split()[0]), ""
+        else: path += key + "/"
+    doc.xref_set_key(holder, path + name, f"{target} 0 R")
+
+def dedupe_images(doc):
+    """Point every reference at one copy of each distinct image; the orphaned copies are dropped on save with garbage collection."""
+    memo, canonical, duplicates, seen, kept = {}, {}, {}, set(), set()
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, smask, name, referencer = img[0], img[1], img[7], img[9] or page.xref
+            if xref not in seen:
+                seen.add(xref)
+                keep = canonical.setdefault(_object_digest(doc, xref, memo), (xref, smask))
+                if keep[0] != xref: duplicates[xref] = (keep, smask)
+            if xref not in duplicates: continue
+            if doc.xref_get_key(referencer, "Resources")[0] == "null":
+                kept.add(xref)  # inherited resources, leave this reference alone
+                continue
+            _set_xobject_ref(doc, referencer, name, duplicates[xref][0][0])
+    bytes_saved = 0
+    for xref, ((_, keep_smask), smask) in duplicates.items():
+        if xref in kept: continue
+        bytes_saved += _saved_stream_size(doc, xref)
+        if smask and smask != keep_smask: bytes_saved += _saved_stream_size(doc, smask)
+    return {"duplicates": len(duplicates) - len(kept), "bytes_saved": bytes_saved}
+
+def compress_images_in_pdf(doc, quality=50, max_width=1024, workers=1):
+    stats = {"recompressed": 0, "skipped": {}, "dedup": dedupe_images(doc)}
+    jobs = list(_extract_image_jobs(doc, quality, max_width, stats))
+    return _apply_image_results(doc, _run_image_jobs(jobs, workers), stats)
+
+def _current_rss(pid='self'):
+    """Resident set size of a process (this one by default) in bytes, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None or pid != 'self': return None
+        # Fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def compress_images_bounded(pdf_path, work_path, output_path, quality, max_width, save_options,
+                            workers=1, max_rss=1024 * 1024 * 1024, batch_bytes=128 * 1024 * 1024):
+    """Recompress a large PDF's images in batches so memory stays flat regardless of file size.
+
+    The upload is copied to work_path and every batch of replaced streams is flushed there with an
+    incremental save, after which the document is reopened to release them. A batch is flushed once
+    its decoded images reach the batch limit (batch_bytes at first) or the process RSS reaches max_rss.
+    The allocator rarely hands memory back, so RSS is measured again after each flush: while that
+    baseline stays at or above max_rss the batch limit halves (down to batch_bytes / 16), and RSS only
+    forces a flush once it grows by the batch limit past the baseline. Otherwise every image would get
+    its own save and the xref chain would grow with each one.
+    """
+    doc = fitz.open(pdf_path)
+    if doc.can_save_incrementally():
+        doc.close()
+        shutil.copyfile(pdf_path, work_path)
+    else:
+        # Repaired files need one full rewrite before they accept incremental updates
+        doc.save(work_path)
+        doc.close()
+
+    doc = fitz.open(work_path)
+    stats = {"recompressed": 0, "skipped": {}, "dedup": dedupe_images(doc), "batches": 0, "peak_rss": _current_rss()}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        pending, pending_bytes = [], 0
+        batch_limit, rss_limit = batch_bytes, max_rss
+        xrefs = _image_xrefs(doc)
+        for i, xref in enumerate(xrefs):
+            job = _extract_image_job(doc, xref, quality, max_width, stats)
+            if job:
+                pending.append(job)
+                pending_bytes += _decoded_image_bytes(doc, xref, job[1])
+            rss = _current_rss()
+            if rss: stats["peak_rss"] = max(stats["peak_rss"] or 0, rss)
+            if i == len(xrefs) - 1 or pending and (pending_bytes >= batch_limit or (rss and rss >= rss_limit)):
+                _apply_image_results(doc, _run_image_jobs(pending, workers, pool), stats)
+                doc.saveIncr()
+                doc.close()
+                doc = fitz.open(work_path)
+                pending, pending_bytes = [], 0
+                stats["batches"] += 1
+                baseline = _current_rss()
+                if baseline and baseline >= max_rss:
+                    batch_limit = max(batch_limit // 2, batch_bytes // 16)
+                    rss_limit = baseline + batch_limit
+                else: rss_limit = max_rss
+        if not xrefs: doc.saveIncr()
+        # garbage=4 would compare every stream in memory; 3 still drops the replaced originals
+        doc.save(output_path, **dict(save_options, garbage=min(save_options.get("garbage", 3), 3)))
+    finally:
+        if pool is not None: pool.shutdown()
+        doc.close()
+    return stats
+
+# (quality, max_width, save options) per compression level; 'less' only cleans up the structure
+COMPRESSION_LEVELS = {
+    'extreme': (30, 800, dict(garbage=4, deflate=True, clean=True)),
+    'recommended': (60, 1600, dict(garbage=4, deflate=True)),
+    'less': (None, None, dict(garbage=3, deflate=True)),
+}
+
+# (quality, max_width) candidates for target-size mode, largest output first
+TARGET_SIZE_LADDER = [(85, 2400), (75, 2000), (65, 1600), (60, 1400), (50, 1200),
+                      (40, 1024), (30, 800), (25, 640), (20, 512), (15, 400)]
+
+def _decode_image_payloads(doc, stats):
+    # quality/max_width of 0 means no JPEG is treated as already optimal: any image may have to shrink
+    payloads = []
+    for xref, payload, _, _ in _extract_image_jobs(doc, 0, 0, stats):
+        try:
+            if isinstance(payload, bytes):
+                pix = fitz.Pixmap(payload)
+                if pix.n - pix.alpha > 3: pix = fitz.Pixmap(fitz.csRGB, pix)
+                payload = (pix.width, pix.height, pix.n, pix.samples)
+            payloads.append((xref, payload))
+        except Exception as e:
+            print(f"Skipping image {xref}: {e}")
+            stats["skipped"]["failed"] = stats["skipped"].get("failed", 0) + 1
+    return payloads
+
+def compress_all_levels(pdf_path, output_paths, workers=1):
+    """Write every level in COMPRESSION_LEVELS from one parse of the PDF and one decode of each image.
+
+    The lossless 'less' output is written first and reopened as the base for the lossy levels, so
+    their saves start from objects that are already deduplicated, garbage-collected and deflated.
+    """
+    doc = fitz.open(pdf_path)
+    dedup = dedupe_images(doc)
+    doc.save(output_paths['less'], **COMPRESSION_LEVELS['less'][2])
+    doc.close()
+
+    doc = fitz.open(output_paths['less'])
+    shared = {"skipped": {}}
+    payloads = _decode_image_payloads(doc, shared)
+    stats = {'less': {"recompressed": 0, "skipped": {}, "dedup": dedup}}
+    # Skip decisions must be made before any stream is replaced
+    plans = {}
+    for level in ('recommended', 'extreme'):
+        quality, max_width, _ = COMPRESSION_LEVELS[level]
+        stats[level] = {"recompressed": 0, "skipped": dict(shared["skipped"]), "dedup": dedup}
+        plans[level] = []
+        for xref, payload in payloads:
+            reason = _precheck_image(doc, xref, quality, max_width)
+            if reason:
+                stats[level]["skipped"][reason] = stats[level]["skipped"].get(reason, 0) + 1
+            else:
+                plans[level].append((xref, payload, quality, max_width))
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(payloads))) if workers > 1 and len(payloads) > 1 else None
+    try:
+        # Every image extreme keeps is also kept by recommended, so running recommended first lets
+        # extreme overwrite all of its replacements on the same document
+        for level in ('recommended', 'extreme'):
+            _apply_image_results(doc, _run_image_jobs(plans[level], workers, pool), stats[level])
+            # The base is already collected; garbage above 1 would also renumber the xrefs of the open document
+            doc.save(output_paths[level], **dict(COMPRESSION_LEVELS[level][2], garbage=1))
+    finally:
+        if pool is not None: pool.shutdown()
+        doc.close()
+    return stats
+
+def compress_to_target_size(doc, target_size, workers=1):
+    """Binary-search TARGET_SIZE_LADDER for the best settings whose output fits in target_size bytes.
+
+    Images are decoded once and kept in memory, so every step only re-encodes them. The output size
+    is estimated from the encoded image sizes plus the rest of the document, serialized once.
+    """
+    stats = {"recompressed": 0, "skipped": {}, "dedup": dedupe_images(doc)}
+    payloads = _decode_image_payloads(doc, stats)
+    raw_sizes = {xref: _saved_stream_size(doc, xref) for xref, _ in payloads}
+    # garbage=1 frees unused objects without renumbering the xrefs we still hold
+    overhead = len(doc.tobytes(garbage=1, deflate=True)) - sum(raw_sizes.values())
+    encoded = {}
+
+    def estimate(step, pool):
+        if step not in encoded:
+            quality, max_width = TARGET_SIZE_LADDER[step]
+            jobs = [(xref, payload, quality, max_width) for xref, payload in payloads]
+            encoded[step] = _run_image_jobs(jobs, workers, pool)
+        return overhead + sum(len(r[0]) if isinstance(r, tuple) else raw_sizes[xref] for xref, r in encoded[step])
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(payloads))) if workers > 1 and len(payloads) > 1 else None
+    try:
+        lo, hi = 0, len(TARGET_SIZE_LADDER) - 1
+        best = hi
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if estimate(mid, pool) <= target_size:
+                best, hi = mid, mid - 1
+            else:
+                lo = mid + 1
+        estimated_size = estimate(best, pool)
+    finally:
+        if pool is not None: pool.shutdown()
+
+    _apply_image_results(doc, encoded[best], stats)
+    quality, max_width = TARGET_SIZE_LADDER[best]
+    return stats, {'quality': quality, 'max_width': max_width, 'iterations': len(encoded), 'estimated_size': estimated_size}
+
+def _validate_merge_source(source):
+    """Open one merge source and return its page count, or an error message. Runs in pool workers too."""
+    path, name = source
+    try:
+        doc = fitz.open(path)
+    except Exception:
+        return f"{name} could not be opened as a PDF"
+    try:
+        if not doc.is_pdf: return f"{name} is not a PDF"
+        if doc.needs_pass: return f"{name} is password protected"
+        if doc.page_count == 0: return f"{name} has no pages"
+        return doc.page_count
+    finally:
+        doc.close()
+
+def _merge_chunk(job):
+    """Concatenate a run of sources into one intermediate PDF. Runs in pool workers."""
+    sources, chunk_path = job
+    merged = fitz.open()
+    for path, _ in sources:
+        src = fitz.open(path)
+        merged.insert_pdf(src)
+        src.close()
+    merged.save(chunk_path)
+    merged.close()
+    return chunk_path
+
+def merge_pdf_files(sources, output_path, workers=1, dedupe=False, tree_min_sources=16):
+    """Merge (path, name) sources into output_path and return merge statistics.
+
+    Sources are opened and validated in parallel before any merging starts. Batches of at least
+    tree_min_sources files are first concatenated in chunks by the pool, so the per-file open and
+    graft work is spread over all workers, and the chunks are then merged in order. The result is
+    saved with full garbage collection, which also merges identical font and image streams, and
+    with object streams.
+    """
+    start = time.perf_counter()
+    workers = min(workers, len(sources))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    chunk_paths = []
+    try:
+        page_counts = list(pool.map(_validate_merge_source, sources) if pool else map(_validate_merge_source, sources))
+        errors = [count for count in page_counts if isinstance(count, str)]
+        if errors: raise ValueError("; ".join(errors))
+
+        parts = [path for path, _ in sources]
+        tree = pool is not None and len(sources) >= tree_min_sources
+        if tree:
+            size = -(-len(sources) // workers)
+            for _ in range(0, len(sources), size):
+                fd, chunk_path = tempfile.mkstemp(suffix='.pdf', dir=app.config['UPLOAD_FOLDER'])
+                os.close(fd)
+                chunk_paths.append(chunk_path)
+            jobs = [(sources[i:i + size], chunk_path) for i, chunk_path in zip(range(0, len(sources), size), chunk_paths)]
+            parts = list(pool.map(_merge_chunk, jobs))
+
+        result_doc = fitz.open()
+        for part in parts:
+            src = fitz.open(part)
+            result_doc.insert_pdf(src)
+            src.close()
+    finally:
+        if pool is not None: pool.shutdown()
+        for chunk_path in chunk_paths:
+            if os.path.exists(chunk_path): os.remove(chunk_path)
+
+    dedup = dedupe_images(result_doc) if dedupe else None
+    result_doc.save(output_path, garbage=4, deflate=True, use_objstms=1)
+    result_doc.close()
+
+    seconds = time.perf_counter() - start
+    pages = sum(page_counts)
+    # A naive concatenation writes out every source object unchanged, so it is about the sum of the inputs
+    input_size = sum(os.path.getsize(path) for path, _ in sources)
+    output_size = os.path.getsize(output_path)
+    stats = {
+        'sources': len(sources),
+        'pages': pages,
+        'tree': tree,
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(pages / seconds, 1) if seconds else None,
+        'input_size': input_size,
+        'output_size': output_size,
+        'size_comparison': f"{get_size_format(input_size)} ➔ {get_size_format(output_size)}"
+    }
+    if dedup: stats['dedup'] = dedup
+    return stats
+
+SPLIT_MODES = ('pages', 'every', 'ranges', 'size', 'bookmarks')
+
+def parse_page_ranges(range_str, total_pages):
+    """Parses '1-10, 11-20, 25' into 0-based inclusive (first, last) ranges, one per comma-separated chunk."""
+    ranges = []
+    for part in range_str.split(','):
+        part = part.strip()
+        if not part: continue
+        try:
+            if '-' in part: start, end = map(int, part.split('-'))
+            else: start = end = int(part)
+        except ValueError: continue
+        # Like parse_page_string, ranges wholly outside the document give nothing and partial ones are
+        # clamped; "5-1" keeps its reverse order
+        if max(start, end) < 1 or min(start, end) > total_pages: continue
+        ranges.append((min(max(start, 1), total_pages) - 1, min(max(end, 1), total_pages) - 1))
+    return ranges
+
+def _stream_length(doc, xref):
+    typ, val = doc.xref_get_key(xref, "Length")
+    return int(val) if typ == "int" else len(doc.xref_stream_raw(xref))
+
+def _size_capped_ranges(doc, start, end, max_bytes):
+    # Each page weighs its content streams plus the images and embedded fonts the part doesn't carry yet
+    ranges, first, part_bytes, part_xrefs = [], start, 0, set()
+    for i in range(start, end):
+        page = doc[i]
+        xrefs = set(page.get_contents())
+        for img in page.get_images(full=True): xrefs.update(x for x in img[:2] if x)
+        xrefs.update(font[0] for font in page.get_fonts(full=True) if font[0])
+        added = 1024 + sum(_stream_length(doc, x) for x in xrefs - part_xrefs if doc.xref_is_stream(x))
+        if i > first and part_bytes + added > max_bytes:
+            ranges.append((first, i - 1))
+            first, part_bytes, part_xrefs = i, 0, set()
+            added = 1024 + sum(_stream_length(doc, x) for x in xrefs if doc.xref_is_stream(x))
+        part_bytes += added
+        part_xrefs |= xrefs
+    if end > start: ranges.append((first, end - 1))
+    return ranges
+
+def _bookmark_ranges(doc):
+    starts, titles = [], []
+    for level, title, page in doc.get_toc(simple=True):
+        if level != 1 or page < 1 or (starts and page - 1 <= starts[-1]): continue
+        starts.append(page - 1)
+        titles.append(title)
+    if not starts: raise ValueError('This PDF has no top-level bookmarks to split by')
+    if starts[0] > 0:
+        starts.insert(0, 0)
+        titles.insert(0, 'front_matter')
+    ends = [s - 1 for s in starts[1:]] + [len(doc) - 1]
+    return list(zip(titles, starts, ends))
+
+def plan_split_parts(doc, base_name, mode='pages', start=0, end=None, every=1, ranges='', max_bytes=None):
+    """Turn a split mode into (name, first_page, last_page) parts, 0-based and inclusive, in output order."""
+    end = len(doc) if end is None else end
+    def part(first, last):
+        if first == last: return f"{base_name}_page_{first + 1}.pdf", first, last
+        return f"{base_name}_pages_{first + 1}-{last + 1}.pdf", first, last
+    if mode == 'every':
+        every = max(1, every)
+        return [part(i, min(i + every, end) - 1) for i in range(start, end, every)]
+    if mode == 'ranges':
+        parts = [part(first, last) for first, last in parse_page_ranges(ranges, len(doc))]
+        if not parts: raise ValueError('No valid page ranges given')
+        return parts
+    if mode == 'size':
+        if not max_bytes or max_bytes <= 0: raise ValueError('A positive max_mb is required for size mode')
+        return [part(first, last) for first, last in _size_capped_ranges(doc, start, end, max_bytes)]
+    if mode == 'bookmarks':
+        return [(f"{base_name}_{i + 1:02d}_{secure_filename(title) or 'section'}.pdf", first, last)
+                for i, (title, first, last) in enumerate(_bookmark_ranges(doc))]
+    return [part(i, i) for i in range(start, end)]
+
+def _iter_split_parts(pdf_path, parts, subset_fonts):
+    src = fitz.open(pdf_path)
+    try:
+        for name, first, last in parts:
+            part = fitz.open()
+            part.insert_pdf(src, from_page=first, to_page=last)
+            if subset_fonts: part.subset_fonts()
+            # garbage=3 leaves each part with only the objects its own pages reference
+            yield name, part.tobytes(garbage=3, deflate=True)
+            part.close()
+    finally:
+        src.close()
+
+def _split_shard(job):
+    """Write every (name, first, last) part of one shard with a single open of the source. Runs in pool workers."""
+    return list(_iter_split_parts(*job))
+
+def split_pdf_parts(pdf_path, parts, workers=1, subset_fonts=False):
+    """Yield (name, pdf_bytes) for each (name, first_page, last_page) part, in order.
+
+    With workers > 1 the parts are grouped into contiguous shards, each opening the source once in a
+    pool worker. The first part is a shard of its own so streamed output starts right away.
+    """
+    if workers <= 1 or len(parts) <= 1:
+        yield from _iter_split_parts(pdf_path, parts, subset_fonts)
+        return
+    shard_size = max(1, min(64, len(parts) // (workers * 4)))
+    jobs = [(pdf_path, parts[:1], subset_fonts)]
+    jobs += [(pdf_path, parts[i:i + shard_size], subset_fonts) for i in range(1, len(parts), shard_size)]
+    yield from _ordered_pool_results(_split_shard, jobs, workers)
+
+class _ZipStream(io.RawIOBase):
+    """Unseekable sink for zipfile.ZipFile; written bytes are handed out by drain() instead of being kept."""
+    def __init__(self):
+        super().__init__()
+        self._chunks, self._pos = [], 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+def stream_zip(entries, **zip_options):
+    """Yield a zip archive of (name, data) entries chunk by chunk, one entry at a time."""
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', **zip_options) as zipf:
+        for name, data in entries:
+            zipf.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
+
+def zip_options_from_form():
+    # 'stored' keeps the old uncompressed archives; 'deflate' trades CPU for size with a 0-9 level
+    if request.form.get('zip_compression', 'stored').lower() != 'deflate':
+        return {'compression': zipfile.ZIP_STORED}
+    level = request.form.get('zip_level', 6, type=int)
+    return {'compression': zipfile.ZIP_DEFLATED, 'compresslevel': max(0, min(level, 9))}
+
+PPT_SLIDE_WIDTH_IN = 10
+PPT_IMAGE_FORMATS = ('auto', 'png', 'jpeg')
+
+def _ppt_slide_size(doc):
+    """Slide (width, height) in inches: PPT_SLIDE_WIDTH_IN wide, with the aspect ratio of the most common page size."""
+    sizes = {}
+    for page in doc:
+        key = (round(page.rect.width), round(page.rect.height))
+        sizes[key] = sizes.get(key, 0) + 1
+    w, h = max(sizes, key=sizes.get)
+    # PowerPoint accepts slides from 1 to 56 inches per side
+    return PPT_SLIDE_WIDTH_IN, min(max(PPT_SLIDE_WIDTH_IN * h / w, 1), 56)
+
+def _fit_to_slide(page_w, page_h, slide_w, slide_h):
+    """(left, top, width, height) in inches placing a page on the slide at its own aspect ratio, centred."""
+    scale = min(slide_w / page_w, slide_h / page_h)
+    width, height = page_w * scale, page_h * scale
+    return (slide_w - width) / 2, (slide_h - height) / 2, width, height
+
+def _page_image_format(page, image_format):
+    # Pages mostly covered by raster images compress far better as JPEG; text and vector art stay PNG
+    if image_format != 'auto': return image_format
+    area = abs(page.rect)
+    covered = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+    return 'jpeg' if area and covered / area >= 0.35 else 'png'
+
+def _render_slide_image(page, options, encoded):
+    slide_w, slide_h, dpi, image_format = options
+    width_in = _fit_to_slide(page.rect.width, page.rect.height, slide_w, slide_h)[2]
+    zoom = width_in * dpi / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    fmt = _page_image_format(page, image_format)
+    key = (pix.width, pix.height, fmt, hashlib.sha1(pix.samples_mv).digest())
+    if key not in encoded:
+        encoded[key] = pix.tobytes("jpeg", jpg_quality=85) if fmt == 'jpeg' else pix.tobytes("png")
+    return encoded[key]
+
+def _iter_rendered_pages(pdf_path, first, last, options):
+    encoded = {}  # identical renders are encoded once
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(first, last + 1):
+            yield _render_slide_image(doc.load_page(page_num), options, encoded)
+    finally:
+        doc.close()
+
+def _render_page_range(job):
+    """Encode pages first..last with a single open of the source. Runs in pool workers."""
+    return list(_iter_rendered_pages(*job))
+
+def render_pdf_pages(pdf_path, page_count, options, workers=1):
+    """Yield every page rendered to image bytes, in page order.
+
+    options is (slide_width_in, slide_height_in, dpi, image_format): each page is rendered at dpi for the
+    size it will have on the slide. With workers > 1 contiguous page ranges are rendered in a process pool,
+    each worker with its own document handle.
+    """
+    if workers <= 1 or page_count <= 1:
+        yield from _iter_rendered_pages(pdf_path, 0, page_count - 1, options)
+        return
+    chunk = max(1, min(16, page_count // (workers * 4)))
+    jobs = [(pdf_path, i, min(i + chunk, page_count) - 1, options) for i in range(0, page_count, chunk)]
+    yield from _ordered_pool_results(_render_page_range, jobs, workers)
+
+PPT_MODES = ('image', 'native')
+# Native mode rebuilds lines and rectangles as shapes; pages with more paths, or curves, are rasterized
+PPT_NATIVE_MAX_DRAWINGS = 200
+
+def _native_page_ok(page, drawings):
+    # Drawings, images and text come back in unrotated page space, which doesn't match a rotated page.rect
+    if page.rotation: return False
+    if len(drawings) > PPT_NATIVE_MAX_DRAWINGS: return False
+    if any(item[0] not in ('l', 're') for path in drawings for item in path['items']): return False
+    # Text boxes are placed unrotated, so pages with vertical or rotated text are rasterized too
+    text = page.get_text("dict", flags=0)
+    return all(line['dir'] == (1.0, 0.0) for block in text['blocks'] for line in block.get('lines', []))
+
+def _pptx_rgb(color):
+    return RGBColor(*(int(round(c * 255)) for c in color[:3]))
+
+def _native_image_bytes(doc, page, info, dpi):
+    xref = info.get('xref', 0)
+    if xref:
+        try:
+            img = doc.extract_image(xref)
+            if img['ext'] in ('png', 'jpeg', 'bmp', 'gif', 'tiff') and not img['smask']: return img['image']
+            pix = fitz.Pixmap(doc, xref)
+            if pix.colorspace and pix.colorspace.n > 3: pix = fitz.Pixmap(fitz.csRGB, pix)
+            if img['smask']: pix = fitz.Pixmap(pix, fitz.Pixmap(doc, img['smask']))
+            return pix.tobytes("png")
+        except Exception:
+            pass
+    # Inline images and formats python-pptx can't take: render that area of the page instead
+    return page.get_pixmap(clip=info['bbox'], dpi=dpi).tobytes("png")
+
+def _add_native_slide(slide, doc, page, drawings, box, dpi):
+    """Place the page's lines, rectangles, images and text on the slide as native shapes."""
+    left, top, width, _ = box
+    k = width / page.rect.width  # inches per PDF point
+    x = lambda v: Inches(left + v * k)
+    y = lambda v: Inches(top + v * k)
+    size = lambda v: Inches(max(v * k, 0.001))
+    for path in drawings:
+        stroke, fill = path.get('color'), path.get('fill')
+        line_width = Pt(max((path.get('width') or 1) * k * 72, 0.25))
+        for item in path['items']:
+            if item[0] == 'l':
+                p1, p2 = item[1], item[2]
+                shape = slide.shapes.add_connector(MSO_CONNECTOR.STRAIGHT, x(p1.x), y(p1.y), x(p2.x), y(p2.y))
+                if stroke: shape.line.color.rgb = _pptx_rgb(stroke)
+                else: shape.line.color.rgb = _pptx_rgb(fill or (0, 0, 0))
+                shape.line.width = line_width
+                continue
+            rect = item[1]
+            shape = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, x(rect.x0), y(rect.y0), size(rect.width), size(rect.height))
+            shape.shadow.inherit = False
+            if fill:
+                shape.fill.solid()
+                shape.fill.fore_color.rgb = _pptx_rgb(fill)
+            else: shape.fill.background()
+            if stroke:
+                shape.line.color.rgb = _pptx_rgb(stroke)
+                shape.line.width = line_width
+            else: shape.line.fill.background()
+    for info in page.get_image_info(xrefs=True):
+        bbox = fitz.Rect(info['bbox']) & page.rect
+        if bbox.is_empty: continue
+        data = _native_image_bytes(doc, page, info, dpi)
+        slide.shapes.add_picture(io.BytesIO(data), x(bbox.x0), y(bbox.y0), width=size(bbox.width), height=size(bbox.height))
+    for block in page.get_text("dict", flags=0)['blocks']:
+        if block['type'] != 0: continue
+        bbox = fitz.Rect(block['bbox'])
+        text_frame = slide.shapes.add_textbox(x(bbox.x0), y(bbox.y0), size(bbox.width), size(bbox.height)).text_frame
+        text_frame.word_wrap = False
+        text_frame.margin_left = text_frame.margin_right = text_frame.margin_top = text_frame.margin_bottom = 0
+        for i, line in enumerate(block['lines']):
+            paragraph = text_frame.paragraphs[0] if i == 0 else text_frame.add_paragraph()
+            for span in line['spans']:
+                if not span['text']: continue
+                run = paragraph.add_run()
+                run.text = span['text']
+                run.font.size = Pt(max(span['size'] * k * 72, 1))
+                run.font.bold = bool(span['flags'] & 16)
+                run.font.italic = bool(span['flags'] & 2)
+                # Drop the subset tag from names like "ABCDEF+Calibri"
+                run.font.name = re.sub(r'^[A-Z]{6}\+', '', span['font'])
+                run.font.color.rgb = RGBColor.from_string(f"{span['color']:06X}")
+
+def convert_pdf_to_pptx_logic(pdf_path, pptx_path, workers=1, dpi=150, image_format='auto', mode='image'):
+    """Build the deck; returns the 1-based pages that native mode had to rasterize."""
     prs = Presentation()
     doc = fitz.open(pdf_path)
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img_stream = io.BytesIO(pix.tobytes("png"))
-        blank_slide_layout = prs.slide_layouts[6] 
-        slide = prs.slides.add_slide(blank_slide_layout)
-        slide.shapes.add_picture(img_stream, Inches(0), Inches(0), width=Inches(10), height=Inches(7.5))
+    slide_w, slide_h = _ppt_slide_size(doc)
+    page_sizes = [(page.rect.width, page.rect.height) for page in doc]
+    prs.slide_width, prs.slide_height = Inches(slide_w), Inches(slide_h)
+    options = (slide_w, slide_h, dpi, image_format)
+    blank_slide_layout = prs.slide_layouts[6] 
+    raster_pages = []
+    if mode == 'native':
+        encoded = {}
+        try:
+            for page in doc:
+                slide = prs.slides.add_slide(blank_slide_layout)
+                box = _fit_to_slide(page.rect.width, page.rect.height, slide_w, slide_h)
+                drawings = page.get_drawings()
+                if _native_page_ok(page, drawings):
+                    _add_native_slide(slide, doc, page, drawings, box, dpi)
+                    continue
+                raster_pages.append(page.number + 1)
+                left, top, width, height = box
+                data = _render_slide_image(page, options, encoded)
+                slide.shapes.add_picture(io.BytesIO(data), Inches(left), Inches(top), width=Inches(width), height=Inches(height))
+        finally:
+            doc.close()
+        prs.save(pptx_path)
+        return raster_pages
     doc.close()
+    # python-pptx stores pages that render to the same bytes as one shared image part
+    for (page_w, page_h), data in zip(page_sizes, render_pdf_pages(pdf_path, len(page_sizes), options, workers=workers)):
+        slide = prs.slides.add_slide(blank_slide_layout)
+        left, top, width, height = _fit_to_slide(page_w, page_h, slide_w, slide_h)
+        slide.shapes.add_picture(io.BytesIO(data), Inches(left), Inches(top), width=Inches(width), height=Inches(height))
     prs.save(pptx_path)
+    return raster_pages
+
+EXCEL_ENGINES = ('auto', 'pymupdf', 'pdfplumber')
+
+def _pymupdf_tables(page, clip=None, columns=None):
+    kwargs = {'clip': clip}
+    if columns: kwargs.update(vertical_strategy='explicit', vertical_lines=columns)
+    return page.find_tables(**kwargs).tables
+
+def _pdfplumber_tables(page, clip=None, columns=None):
+    if clip is not None: page = page.crop(tuple(fitz.Rect(clip) & fitz.Rect(page.bbox)))
+    settings = {'vertical_strategy': 'explicit', 'explicit_vertical_lines': columns} if columns else {}
+    return page.find_tables(settings)
+
+def _layout_fingerprint(page):
+    """Hash of the page size and the x positions of its vertical rulings, or None without any.
+
+    Column rules stay put from one month's statement to the next while the number of rows changes,
+    so this is what a table template is keyed on.
+    """
+    xs = set()
+    for path in page.get_cdrawings():
+        for item in path['items']:
+            if item[0] == 're': xs.update((item[1][0], item[1][2]))
+            elif item[0] == 'l' and abs(item[1][0] - item[2][0]) < 1: xs.add(item[1][0])
+    if not xs: return None
+    key = [round(page.rect.width), round(page.rect.height)] + sorted({round(x / 3) for x in xs})
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+def _template_regions(tables, page_height):
+    # Tables grow and shrink with the data, so a region runs from the table's top to the bottom of the page
+    regions = []
+    for table in tables:
+        x0, y0, x1, _ = table.bbox
+        columns = sorted({round(x, 1) for cell in table.cells if cell for x in (cell[0], cell[2])})
+        regions.append({'clip': [x0 - 1, y0 - 1, x1 + 1, page_height], 'columns': columns})
+    return regions
+
+def _template_table(page, clip, columns):
+    """Rows of the ruled table in clip, cut along stored column rules and the page's own row rulings.
+
+    This skips the table finders entirely: rows are the bands between horizontal rulings across the
+    columns that a vertical ruling also spans, from the top of the clip down to the first band that
+    isn't ruled. Words go to the cell holding their centre. Returns [] if no ruled row is found.
+    """
+    left, right = columns[0] - 1, columns[-1] + 1
+    ys, verticals = set(), []
+    for path in page.get_cdrawings():
+        for item in path['items']:
+            if item[0] == 're':
+                x0, y0, x1, y1 = item[1]
+                if x1 > left and x0 < right: ys.update((round(y0, 1), round(y1, 1)))
+                verticals += [(x0, y0, y1), (x1, y0, y1)]
+            elif item[0] == 'l':
+                (x0, y0), (x1, y1) = item[1][:2], item[2][:2]
+                if abs(y0 - y1) < 1 and max(x0, x1) > left and min(x0, x1) < right: ys.add(round(y0, 1))
+                elif abs(x0 - x1) < 1: verticals.append((x0, min(y0, y1), max(y0, y1)))
+    verticals = [(y0, y1) for x, y0, y1 in verticals if left <= x <= right]
+    edges = [y for y in sorted(ys) if clip[1] <= y <= clip[3]]
+    rows = []
+    for top, bottom in zip(edges, edges[1:]):
+        middle = (top + bottom) / 2
+        if not any(y0 <= middle <= y1 for y0, y1 in verticals):
+            if rows: break
+            continue
+        rows.append((top, bottom))
+    if not rows: return []
+    tops = [top for top, _ in rows]
+    cells = [[[] for _ in columns[1:]] for _ in rows]
+    area = fitz.Rect(left, rows[0][0], right, rows[-1][1])
+    for x0, y0, x1, y1, text, block, line, _ in page.get_text("words", clip=area, sort=True):
+        r = bisect.bisect_right(tops, (y0 + y1) / 2) - 1
+        c = bisect.bisect_right(columns, (x0 + x1) / 2) - 1
+        if 0 <= r < len(rows) and 0 <= c < len(columns) - 1: cells[r][c].append((block, line, text))
+    table = []
+    for row in cells:
+        out = []
+        for words in row:
+            text, last = '', None
+            for block, line, word in words:
+                if last is not None: text += ' ' if (block, line) == last else '\n'
+                text, last = text + word, (block, line)
+            out.append(text)
+        table.append(out)
+    return table
+
+def _load_template(template_dir, fingerprint, cache):
+    if fingerprint not in cache:
+        try:
+            with open(os.path.join(template_dir, f"{fingerprint}.json")) as f: cache[fingerprint] = json.load(f)
+        except (OSError, ValueError): cache[fingerprint] = None
+    return cache[fingerprint]
+
+def _save_template(template_dir, fingerprint, regions, cache):
+    cache[fingerprint] = regions
+    # Workers may learn the same layout at once; write to a temp file and rename so readers never see half a file
+    fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=template_dir)
+    with os.fdopen(fd, 'w') as f: json.dump(regions, f)
+    os.replace(tmp_path, os.path.join(template_dir, f"{fingerprint}.json"))
+
+def _table_score(page):
+    """Cheap likelihood that a page holds a table, from its ruling lines, text alignment and text density."""
+    rulings = 0
+    for path in page.get_cdrawings():
+        for item in path['items']:
+            if item[0] == 're': rulings += 1
+            elif item[0] == 'l' and (abs(item[1][0] - item[2][0]) < 1 or abs(item[1][1] - item[2][1]) < 1): rulings += 1
+    if not rulings: return 0  # the line-based table finders can't build a cell without rulings
+    line_starts, chars = {}, 0
+    for x0, _, _, _, text, block, line, word in page.get_text("words"):
+        chars += len(text)
+        if word == 0: line_starts[(block, line)] = round(x0 / 2)
+    columns = {}
+    for x in line_starts.values(): columns[x] = columns.get(x, 0) + 1
+    score = 2 if rulings >= 4 else 1
+    if sum(1 for count in columns.values() if count >= 3) >= 2: score += 1
+    # Tables are short cells; narrative text averages long lines
+    if line_starts and chars / len(line_starts) < 40: score += 1
+    return score
+
+# With templates, the first page of a layout in each run and every this many after it are detected anyway
+TEMPLATE_RECHECK_PAGES = 10
+
+def iter_page_tables(pdf_path, pages, engine='auto', prefilter=True, region=None, template_dir=None):
+    """Yield (page_index, tables, source) for each 0-based page in pages, where each table is a list of rows.
+
+    'pymupdf' uses PyMuPDF's built-in table finder, 'pdfplumber' the pure-Python one. 'auto' prefers
+    PyMuPDF and falls back to pdfplumber for any page it fails on, or entirely if the installed
+    PyMuPDF has no find_tables. source is 'detected', 'template' or 'skipped': with prefilter, pages
+    that _table_score rules out skip detection and come back with tables=None. region limits detection
+    to an (x0, y0, x1, y1) area in PDF points. With template_dir, the table regions and column rules found
+    on a page are stored under its _layout_fingerprint, and later pages with the same fingerprint are
+    cut along those columns by _template_table, with no table finder run, whichever engine is chosen.
+    A cut that misses a region's table falls back to detection, some pages are re-detected to check
+    the template, and templates are only learned from whole-page detection (no region).
+    """
+    use_fitz = engine != 'pdfplumber' and hasattr(fitz.Page, 'find_tables')
+    if engine == 'pymupdf' and not use_fitz: raise ValueError('This PyMuPDF build has no table finder')
+    doc = fitz.open(pdf_path)
+    plumber = None
+    templates, uses = {}, {}
+
+    def find(i, clip=None, columns=None):
+        # (table, rows) pairs; both engines' tables have .bbox and .cells
+        if use_fitz:
+            try: return [(table, table.extract()) for table in _pymupdf_tables(doc[i], clip, columns)]
+            except Exception:
+                if engine == 'pymupdf': raise
+        nonlocal plumber
+        if plumber is None: plumber = pdfplumber.open(pdf_path)
+        page = plumber.pages[i]
+        found = [(table, table.extract()) for table in _pdfplumber_tables(page, clip, columns)]
+        # Drop the page's parsed layout objects, which pdfplumber otherwise keeps until close
+        page.close()
+        return found
+
+    try:
+        for i in pages:
+            if prefilter and _table_score(doc[i]) < 2:
+                yield i, None, 'skipped'
+                continue
+            fingerprint = _layout_fingerprint(doc[i]) if template_dir else None
+            template = _load_template(template_dir, fingerprint, templates) if fingerprint else None
+            if template:
+                clips = [fitz.Rect(r['clip']) & fitz.Rect(region) if region else fitz.Rect(r['clip']) for r in template]
+                expected = [(clip, r['columns']) for clip, r in zip(clips, template) if not clip.is_empty]
+                uses[fingerprint] = uses.get(fingerprint, 0) + 1
+                # Every region has to give a table, and the first page of a layout in each call and every
+                # TEMPLATE_RECHECK_PAGES after it are detected anyway, to catch tables the template lacks
+                if (uses[fingerprint] - 1) % TEMPLATE_RECHECK_PAGES:
+                    tables = [_template_table(doc[i], clip, columns) for clip, columns in expected]
+                    if tables and all(tables):
+                        yield i, tables, 'template'
+                        continue
+            found = find(i, region)
+            # A template learned inside a region would drop the tables outside it for every later request
+            if fingerprint and found and region is None and (not template or len(found) != len(template)):
+                regions = _template_regions([table for table, _ in found], doc[i].rect.height)
+                _save_template(template_dir, fingerprint, regions, templates)
+            yield i, [rows for _, rows in found], 'detected'
+    finally:
+        doc.close()
+        if plumber is not None: plumber.close()
+
+def _extract_table_range(job):
+    """Tables for a run of pages with one open of the source. Runs in pool workers."""
+    return list(iter_page_tables(*job))
+
+def extract_pdf_tables(pdf_path, pages, engine='auto', workers=1, prefilter=True, region=None, template_dir=None):
+    """Yield (page_index, tables, source) for the 0-based pages, in the order given.
+
+    With workers > 1 runs of pages are extracted in a process pool, each worker with its own document
+    handles.
+    """
+    options = (engine, prefilter, region, template_dir)
+    if workers <= 1 or len(pages) <= 1:
+        yield from iter_page_tables(pdf_path, pages, *options)
+        return
+    chunk = max(1, min(16, len(pages) // (workers * 4)))
+    jobs = [(pdf_path, pages[i:i + chunk]) + options for i in range(0, len(pages), chunk)]
+    yield from _ordered_pool_results(_extract_table_range, jobs, workers)
+
+def _clean_row(row):
+    return [cell.replace('\n', ' ') if isinstance(cell, str) else cell for cell in row]
+
+def convert_pdf_to_excel_logic(pdf_path, excel_path, engine='auto', workers=1, prefilter=True, pages=None,
+                               region=None, template_dir=None):
+    """Write every detected table to its own sheet; returns the 1-based pages examined, skipped and templated.
+
+    Rows go straight into a write-only workbook, which streams each sheet to disk as it is filled, so
+    memory stays flat however many pages and tables there are.
+    """
+    if pages is None:
+        with fitz.open(pdf_path) as doc: pages = list(range(len(doc)))
+    examined, skipped, templated = [], [], []
+    wb = Workbook(write_only=True)
+    tables_found = False
+    for i, tables, source in extract_pdf_tables(pdf_path, pages, engine, workers=workers, prefilter=prefilter,
+                                                 region=region, template_dir=template_dir):
+        (skipped if tables is None else examined).append(i + 1)
+        if source == 'template': templated.append(i + 1)
+        for j, table in enumerate(tables or []):
+            tables_found = True
+            ws = wb.create_sheet(title=f"Page{i+1}_Table{j+1}")
+            for row in table: ws.append(_clean_row(row))
+    if not tables_found:
+        wb.create_sheet(title="Info").append(["No detected tables in this PDF."])
+    wb.save(excel_path)
+    return {'examined_pages': examined, 'skipped_pages': skipped, 'template_pages': templated}
+
+def _convert_docx_range(job):
+    """Convert pages [start, end) to a .docx of their own. Runs in pool workers."""
+    pdf_path, docx_path, start, end = job
+    cv = Converter(pdf_path)
+    try:
+        cv.convert(docx_path, start=start, end=end)
+    finally:
+        cv.close()
+    return docx_path
+
+def _convert_docx_multiprocess(job):
+    # pdf2docx's multi-processing writes its per-process page JSON into the working directory,
+    # so it runs in a process of its own, inside a directory private to the request
+    pdf_path, docx_path, start, end, cpu, workdir = job
+    os.chdir(workdir)
+    cv = Converter(pdf_path)
+    try:
+        cv.convert(docx_path, start=start, end=end, multi_processing=True, cpu_count=cpu)
+    finally:
+        cv.close()
+    return docx_path
+
+_R_NS = qn('r:id')[:-len('id')]  # '{...relationships}'
+
+def _relink(element, src_part, dst_part):
+    # Point r:embed / r:id / r:link attributes at relationships of the destination document
+    for node in element.iter():
+        for name, value in node.attrib.items():
+            if not name.startswith(_R_NS) or value not in src_part.rels: continue
+            rel = src_part.rels[value]
+            if rel.is_external: new_id = dst_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE: new_id, _ = dst_part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+            else: new_id = dst_part.relate_to(rel.target_part, rel.reltype)
+            node.set(name, new_id)
+
+def stitch_docx(part_paths, output_path):
+    """Concatenate .docx files in order, carrying images, links and each part's section layout along."""
+    master = Document(part_paths[0])
+    body = master.element.body
+    for path in part_paths[1:]:
+        part = Document(path)
+        sect = body.find(qn('w:sectPr'))
+        # The closing section of what we have so far becomes a section break on its last paragraph
+        last = sect.getprevious()
+        if last is None or last.tag != qn('w:p') or last.find(f"{qn('w:pPr')}/{qn('w:sectPr')}") is not None:
+            last = OxmlElement('w:p')
+            sect.addprevious(last)
+        p_pr = last.find(qn('w:pPr'))
+        if p_pr is None:
+            p_pr = OxmlElement('w:pPr')
+            last.insert(0, p_pr)
+        p_pr.append(copy.deepcopy(sect))
+        for child in part.element.body.iterchildren():
+            if child.tag == qn('w:sectPr'): continue
+            element = copy.deepcopy(child)
+            _relink(element, part.part, master.part)
+            sect.addprevious(element)
+        part_sect = part.element.body.find(qn('w:sectPr'))
+        if part_sect is not None: body.replace(sect, copy.deepcopy(part_sect))
+    # Drawing ids must be unique across the whole document
+    for i, doc_pr in enumerate(body.iter(qn('wp:docPr')), 1): doc_pr.set('id', str(i))
+    master.save(output_path)
+
+def _raster_page_docx(pdf_path, docx_path, page_num, dpi=150):
+    """A one-page .docx holding an image of the page, sized to the page with no margins."""
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_num]
+        png = page.get_pixmap(dpi=dpi).tobytes("png")
+        width, height = page.rect.width, page.rect.height
+    document = Document()
+    section = document.sections[0]
+    section.page_width, section.page_height = DocxPt(width), DocxPt(height)
+    section.left_margin = section.right_margin = section.top_margin = section.bottom_margin = 0
+    section.header_distance = section.footer_distance = 0
+    # A hair under full height, or Word pushes the picture onto a second page
+    document.add_picture(io.BytesIO(png), width=DocxPt(width - 1), height=DocxPt(height - 1))
+    paragraph_format = document.paragraphs[-1].paragraph_format
+    paragraph_format.space_before = paragraph_format.space_after = 0
+    document.save(docx_path)
+
+def _convert_budgeted_pages(pdf_path, pages, workdir, workers, timeout, max_bytes):
+    """Convert each page in a child process of its own; returns ({page: docx_path}, fallback_pages).
+
+    A child that runs past timeout seconds or grows its resident memory by more than max_bytes after
+    its first sample is killed, and that page, like any page pdf2docx fails on, is replaced by a
+    rendered image of it.
+    """
+    queue, running, results, fallback = deque(pages), {}, {}, []
+    while queue or running:
+        while queue and len(running) < workers:
+            page = queue.popleft()
+            path = os.path.join(workdir, f"page_{page}.docx")
+            proc = multiprocessing.Process(target=_convert_docx_range, args=((pdf_path, path, page, page + 1),), daemon=True)
+            proc.start()
+            running[page] = (proc, path, time.monotonic(), None)
+        time.sleep(0.05)
+        for page, (proc, path, started, baseline) in list(running.items()):
+            # A forked child starts out sharing this process's pages, so its budget is growth, not total size
+            rss = _current_rss(proc.pid) if max_bytes else None
+            if rss is not None and baseline is None: running[page] = (proc, path, started, rss)
+            over = (timeout and time.monotonic() - started > timeout) or \
+                   (rss is not None and baseline is not None and rss - baseline > max_bytes)
+            if proc.is_alive() and not over: continue
+            if proc.is_alive(): proc.kill()
+            proc.join()
+            del running[page]
+            if proc.exitcode != 0 or not os.path.exists(path):
+                _raster_page_docx(pdf_path, path, page)
+                fallback.append(page)
+            results[page] = path
+    return results, sorted(fallback)
+
+def convert_pdf_to_docx(pdf_path, docx_path, start=0, end=None, workers=1, stitch_min_pages=100,
+                        page_timeout=0, page_max_bytes=0):
+    """Convert pages [start, end) with pdf2docx; returns {'mode', 'fallback_pages'}.
+
+    With workers > 1, ranges of at least stitch_min_pages pages are split into page ranges converted by
+    separate workers and stitched back together in order; shorter ones use pdf2docx's own multi-processing.
+    With a page_timeout or page_max_bytes budget every page is converted on its own under that budget,
+    and fallback_pages lists the 1-based pages that had to be rendered as images instead.
+    """
+    with fitz.open(pdf_path) as doc: end = len(doc) if end is None else min(end, len(doc))
+    if start >= end: raise ValueError('No pages selected')
+    if not (page_timeout or page_max_bytes) and (workers <= 1 or end - start <= 1):
+        _convert_docx_range((pdf_path, docx_path, start, end))
+        return {'mode': 'serial', 'fallback_pages': []}
+    workdir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    try:
+        if page_timeout or page_max_bytes:
+            results, fallback = _convert_budgeted_pages(pdf_path, range(start, end), workdir, workers,
+                                                        page_timeout, page_max_bytes)
+            stitch_docx([results[page] for page in range(start, end)], docx_path)
+            return {'mode': 'budgeted', 'fallback_pages': [page + 1 for page in fallback]}
+        if end - start < stitch_min_pages:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                job = (os.path.abspath(pdf_path), os.path.abspath(docx_path), start, end, workers, workdir)
+                pool.submit(_convert_docx_multiprocess, job).result()
+            return {'mode': 'multiprocess', 'fallback_pages': []}
+        chunk = max(10, -(-(end - start) // (workers * 2)))
+        jobs = [(pdf_path, os.path.join(workdir, f"part_{i}.docx"), i, min(i + chunk, end)) for i in range(start, end, chunk)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            part_paths = list(pool.map(_convert_docx_range, jobs))
+        stitch_docx(part_paths, docx_path)
+        return {'mode': 'stitched', 'fallback_pages': []}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
 
-def convert_pdf_to_excel_logic(pdf_path, excel_path):
-    with pdfplumber.open(pdf_path) as pdf:
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            tables_found = False
-            for i, page in enumerate(pdf.pages):
-                tables = page.extract_tables()
-                if tables:
-                    tables_found = True
-                    for j, table in enumerate(tables):
-                        df = pd.DataFrame(table)
-                        df = df.replace(r'\n', ' ', regex=True)
-                        sheet_name = f"Page{i+1}_Table{j+1}"
-                        df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
-            if not tables_found:
-                df = pd.DataFrame(["No detected tables in this PDF."])
-                df.to_excel(writer, sheet_name="Info", index=False, header=False)
+IMAGE_FORMATS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def _render_png_banded(page, zoom, band_bytes):
+    """PNG-encode a page rendered in horizontal bands, so only one band of pixels is in memory at a time.
+
+    Rows rendered with a clip match the same rows of a full render; only scaled images inside a band
+    can differ by a rounding step.
+    """
+    matrix = fitz.Matrix(zoom, zoom)
+    full = (page.rect * matrix).irect
+    width, height = full.width, full.height
+    band_rows = max(1, band_bytes // (width * 3))
+    encoder = zlib.compressobj(6)
+    yield b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    for y in range(0, height, band_rows):
+        rows = min(band_rows, height - y)
+        # A row of slack on each side; the exact rows are sliced out of whatever the clip rounds to
+        clip = fitz.Rect(page.rect.x0, page.rect.y0 + (full.y0 + y - 1) / zoom,
+                         page.rect.x1, page.rect.y0 + (full.y0 + y + rows + 1) / zoom) & page.rect
+        pix = page.get_pixmap(matrix=matrix, clip=clip)
+        stride, offset = pix.stride, full.y0 + y - pix.y
+        samples = pix.samples_mv
+        # Filter type 0 (none) in front of every scanline
+        data = b"".join(b"\x00" + samples[(offset + r) * stride:(offset + r + 1) * stride] for r in range(rows))
+        pix = samples = None
+        compressed = encoder.compress(data)
+        if compressed: yield _png_chunk(b"IDAT", compressed)
+    yield _png_chunk(b"IDAT", encoder.flush()) + _png_chunk(b"IEND", b"")
+
+def _oversized_page_message(page, dpi, max_pixels):
+    return (f"Page {page.number + 1} at {dpi} dpi would be {abs(page.rect) * (dpi / 72) ** 2 / 1e6:.0f} megapixels; "
+            f"JPEG and WebP output is capped at {max_pixels / 1e6:.0f} megapixels (IMAGES_MAX_MEGAPIXELS). "
+            f"Lower the dpi or choose PNG.")
+
+def _render_page_image(page, options):
+    dpi, image_format, quality, band_bytes, max_pixels = options
+    zoom = dpi / 72
+    if image_format == 'png':
+        if abs(page.rect) * zoom * zoom * 3 > band_bytes: return b"".join(_render_png_banded(page, zoom, band_bytes))
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+    # JPEG and WebP need the whole raster at once; the route turns oversized pages away before rendering
+    if abs(page.rect) * zoom * zoom > max_pixels: raise ValueError(_oversized_page_message(page, dpi, max_pixels))
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    out = io.BytesIO()
+    _pixmap_to_pil(pix.width, pix.height, pix.n, pix.samples_mv).save(out, format=image_format.upper(), quality=quality)
+    return out.getvalue()
+
+def _iter_page_images(pdf_path, pages, base_name, options):
+    ext = IMAGE_FORMATS[options[1]]
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in pages:
+            yield f"{base_name}_page_{page_num + 1}.{ext}", _render_page_image(doc.load_page(page_num), options)
+    finally:
+        doc.close()
+
+def _render_image_range(job):
+    """Render a run of pages with one open of the source. Runs in pool workers."""
+    return list(_iter_page_images(*job))
+
+def render_page_images(pdf_path, pages, base_name, options, workers=1):
+    """Yield (name, image_bytes) for each 0-based page in pages, in order.
+
+    options is (dpi, format, quality, band_bytes, max_pixels). With workers > 1 runs of pages are
+    rendered in a process pool, each worker with its own document handle.
+    """
+    if workers <= 1 or len(pages) <= 1:
+        yield from _iter_page_images(pdf_path, pages, base_name, options)
+        return
+    chunk = max(1, min(8, len(pages) // (workers * 4)))
+    jobs = [(pdf_path, pages[i:i + chunk], base_name, options) for i in range(0, len(pages), chunk)]
+    yield from _ordered_pool_results(_render_image_range, jobs, workers)
+
+WORD_MODES = ('layout', 'text')
+DOCX_IMAGE_EXTS = ('png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff')
+
+def _text_font_sizes(doc, pages):
+    """Body text size (the size with the most characters) and heading sizes, largest first, up to three.
+
+    Returns (None, []) when the pages hold no text, e.g. scans.
+    """
+    counts = {}
+    for page_num in pages:
+        for block in doc[page_num].get_text("dict", flags=0)['blocks']:
+            for line in block.get('lines', []):
+                for span in line['spans']:
+                    chars = len(span['text'].strip())
+                    if not chars: continue
+                    size = round(span['size'], 1)
+                    counts[size] = counts.get(size, 0) + chars
+    if not counts: return None, []
+    body = max(counts, key=counts.get)
+    return body, sorted((size for size in counts if size >= body * 1.15), reverse=True)[:3]
+
+def _block_runs(block):
+    # (text, bold, italic) runs with neighbours of the same style merged; lines are joined with spaces
+    runs = []
+    for line in block['lines']:
+        for k, span in enumerate(line['spans']):
+            text = span['text'] if k or not runs else ' ' + span['text'].lstrip()
+            style = (bool(span['flags'] & 16), bool(span['flags'] & 2))
+            if runs and runs[-1][1:] == style: runs[-1] = (runs[-1][0] + text,) + style
+            else: runs.append((text,) + style)
+    return [(text, bold, italic) for text, bold, italic in runs if text]
+
+def convert_pdf_to_docx_text(pdf_path, docx_path, start=0, end=None, sample_pages=50):
+    """Build an editable text-flow .docx from PyMuPDF's block/span extraction instead of pdf2docx.
+
+    Each text block becomes a paragraph keeping bold and italic runs, blocks set noticeably larger than
+    the body text become headings (levels by size), and image blocks become inline pictures. Layout
+    beyond that is not reproduced. Font sizes are sampled from the first sample_pages pages, or from
+    the rest of the selection if those have no text.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        end = len(doc) if end is None else min(end, len(doc))
+        if start >= end: raise ValueError('No pages selected')
+        body_size, heading_sizes = _text_font_sizes(doc, range(start, min(end, start + sample_pages)))
+        # Leading scans or cover images: sample the rest of the selection, and without any text make no headings
+        if body_size is None: body_size, heading_sizes = _text_font_sizes(doc, range(start + sample_pages, end))
+        document = Document()
+        text_width = document.sections[0].page_width - document.sections[0].left_margin - document.sections[0].right_margin
+        for page_num in range(start, end):
+            for block in doc[page_num].get_text("dict", sort=True)['blocks']:
+                if block['type'] == 1:
+                    data = block['image']
+                    if block['ext'] not in DOCX_IMAGE_EXTS:
+                        try: data = fitz.Pixmap(data).tobytes("png")
+                        except Exception: continue
+                    width = min(DocxPt(fitz.Rect(block['bbox']).width), text_width)
+                    if width > 0: document.add_picture(io.BytesIO(data), width=width)
+                    continue
+                runs = _block_runs(block)
+                if not ''.join(text for text, _, _ in runs).strip(): continue
+                size = max(round(span['size'], 1) for line in block['lines'] for span in line['spans'])
+                if body_size and size >= body_size * 1.15 and len(block['lines']) <= 3:
+                    level = heading_sizes.index(size) + 1 if size in heading_sizes else 3
+                    paragraph = document.add_heading('', level=level)
+                else: paragraph = document.add_paragraph()
+                for text, bold, italic in runs:
+                    run = paragraph.add_run(text)
+                    run.bold, run.italic = bold or None, italic or None
+        document.save(docx_path)
+    finally:
+        doc.close()
 
 def parse_page_string(order_str, total_pages):
     selected_pages = []
@@ -114,6 +1706,72 @@ def parse_page_string(order_str, total_pages):
         except ValueError: pass
     return selected_pages if selected_pages else list(range(total_pages))
 
+def parse_rotations(rotate_str, total_pages):
+    """Parses '1:90, 3-4:180' into {0-based page: degrees}; pages use the original numbering."""
+    rotations = {}
+    for part in (rotate_str or '').split(','):
+        pages, _, angle = part.partition(':')
+        try:
+            angle = int(angle)
+            if '-' in pages: start, end = map(int, pages.split('-'))
+            else: start = end = int(pages)
+        except ValueError: continue
+        if angle % 90: raise ValueError(f'Rotation must be a multiple of 90 degrees, got {angle}')
+        for p in range(min(start, end), max(start, end) + 1):
+            if 1 <= p <= total_pages: rotations[p - 1] = (rotations.get(p - 1, 0) + angle) % 360
+    return rotations
+
+def _rotate_pages(doc, rotations):
+    for pno, angle in rotations.items():
+        if angle: doc[pno].set_rotation((doc[pno].rotation + angle) % 360)
+
+def organize_pdf_file(upload, output_path, indices, rotations=None, compact=False):
+    """Write the 0-based pages in indices, in that order, turning pages by {page: degrees} first.
+
+    Reordering, deleting and rotating only change the page tree and page dictionaries, so they are appended
+    as an incremental update to a byte-for-byte copy of the upload. Repeated pages need duplicated page
+    objects, and files MuPDF had to repair can't take an incremental update; those, and compact=True (which
+    drops the bytes of deleted pages), get the full rewrite. Returns "incremental" or "full".
+    """
+    rotations = rotations or {}
+    if not compact and len(set(indices)) == len(indices):
+        upload.copy_to(output_path)
+        doc = fitz.open(output_path)
+        try:
+            if doc.can_save_incrementally():
+                _rotate_pages(doc, rotations)
+                if indices != list(range(len(doc))): doc.select(indices)
+                doc.saveIncr()
+                return "incremental"
+        finally:
+            doc.close()
+    doc = upload.open_pdf()
+    try:
+        _rotate_pages(doc, rotations)
+        doc.select(indices)
+        doc.save(output_path, garbage=1)
+    finally:
+        doc.close()
+    return "full"
+
+def _compress_response(upload, output_path, original_size, images, target=None):
+    new_size = os.path.getsize(output_path)
+    if new_size >= original_size:
+        # Compression didn't help: hand back the original bytes, no second parse/save
+        upload.copy_to(output_path)
+        new_size = original_size
+
+    response = {
+        'message': 'Compression successful',
+        'download_url': download_url(output_path),
+        'size_comparison': f"{get_size_format(original_size)} ➔ {get_size_format(new_size)}",
+        'images': images
+    }
+    if target:
+        target['target_met'] = new_size <= target['target_size']
+        response['target'] = target
+    return jsonify(response)
+
 # --- FRONTEND ROUTES (Serving HTML) ---
 
 @app.route('/')
@@ -128,6 +1786,10 @@ def view_compress():
 def view_merge():
     return render_template('MergePDF.html')
 
+@app.route('/tool/split')
+def view_split():
+    return render_template('SplitPDF.html')
+
 @app.route('/tool/organize')
 def view_organize():
     return render_template('OrganizePDF.html')
@@ -145,133 +1807,297 @@ def view_ppt():
 @app.route('/compress-pdf', methods=['POST'])
 def compress_pdf():
     if 'file' not in request.files: return jsonify({'error': 'No file part'}), 400
-    file = request.files['file']
-    if file.filename == '': return jsonify({'error': 'No selected file'}), 400
-
-    filename = secure_filename(file.filename)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pdf_path)
-    
-    original_size = os.path.getsize(pdf_path)
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No selected file'}), 400
+
+    filename = upload.filename
+    original_size = upload.size
     level = request.form.get('level', 'recommended') 
+    target_size = parse_size(request.form.get('target_size'))
+    bounded = form_flag('bounded', original_size >= app.config['COMPRESS_BOUNDED_THRESHOLD_MB'] * 1024 * 1024)
+    workers = form_workers('COMPRESS_WORKERS')
     base_name = filename.rsplit('.', 1)[0]
     output_filename = f"{base_name}_compressed.pdf"
-    output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], output_filename)
+    output_path = download_path(output_filename)
 
     try:
-        doc = fitz.open(pdf_path)
-        if level == 'extreme':
-            compress_images_in_pdf(doc, quality=30, max_width=800)
-            doc.save(output_path, garbage=4, deflate=True, clean=True)
-        elif level == 'recommended':
-            compress_images_in_pdf(doc, quality=60, max_width=1600)
+        if level == 'all':
+            output_paths = {lvl: download_path(f"{base_name}_compressed_{lvl}.pdf") for lvl in COMPRESSION_LEVELS}
+            images = compress_all_levels(upload.as_path(), output_paths, workers=workers)
+            results = {}
+            for lvl, path in output_paths.items():
+                new_size = os.path.getsize(path)
+                if new_size >= original_size:
+                    upload.copy_to(path)
+                    new_size = original_size
+                results[lvl] = {
+                    'download_url': download_url(path),
+                    'size': new_size,
+                    'size_comparison': f"{get_size_format(original_size)} ➔ {get_size_format(new_size)}"
+                }
+            return jsonify({'message': 'Compression successful', 'results': results, 'images': images})
+
+        images = {"recompressed": 0, "skipped": {}}
+        target = None
+        if level not in COMPRESSION_LEVELS: level = 'less'
+        quality, max_width, save_options = COMPRESSION_LEVELS[level]
+        if bounded and quality and not target_size:
+            fd, work_path = tempfile.mkstemp(suffix='.pdf', dir=app.config['UPLOAD_FOLDER'])
+            os.close(fd)
+            try:
+                images = compress_images_bounded(upload.as_path(), work_path, output_path, quality, max_width, save_options,
+                                                 workers=workers,
+                                                 max_rss=app.config['COMPRESS_MAX_RSS_MB'] * 1024 * 1024,
+                                                 batch_bytes=app.config['COMPRESS_BATCH_MB'] * 1024 * 1024)
+            finally:
+                os.remove(work_path)
+            images['peak_memory'] = get_size_format(images.pop('peak_rss') or 0)
+            return _compress_response(upload, output_path, original_size, images)
+
+        doc = upload.open_pdf()
+        if target_size:
+            images, target = compress_to_target_size(doc, target_size, workers=workers)
+            target['target_size'] = target_size
             doc.save(output_path, garbage=4, deflate=True)
+        elif quality:
+            images = compress_images_in_pdf(doc, quality=quality, max_width=max_width, workers=workers)
+            doc.save(output_path, **save_options)
         else:
-            doc.save(output_path, garbage=3, deflate=True)
+            images["dedup"] = dedupe_images(doc)
+            doc.save(output_path, **save_options)
         doc.close()
 
-        new_size = os.path.getsize(output_path)
-        if new_size >= original_size:
-            doc = fitz.open(pdf_path)
-            doc.save(output_path)
-            doc.close()
-            new_size = original_size
-
-        return jsonify({
-            'message': 'Compression successful',
-            'download_url': f'/download/{output_filename}',
-            'size_comparison': f"{get_size_format(original_size)} ➔ {get_size_format(new_size)}"
-        })
+        return _compress_response(upload, output_path, original_size, images, target)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/merge-pdfs', methods=['POST'])
 def merge_pdfs():
-    uploaded_files = request.files.getlist('files')
-    if not uploaded_files or uploaded_files[0].filename == '': return jsonify({'error': 'No files selected'}), 400
+    uploaded_files = get_uploads('files')
+    if not uploaded_files: return jsonify({'error': 'No files selected'}), 400
+    dedupe = form_flag('dedupe_images')
+    workers = form_workers('MERGE_WORKERS')
+    first_name = uploaded_files[0].filename.rsplit('.', 1)[0]
+    output_filename = f"Merged_{first_name}_and_others.pdf"
+    output_path = download_path(output_filename)
     try:
-        result_doc = fitz.open()
-        for file in uploaded_files:
-            file_stream = file.read()
-            src_doc = fitz.open("pdf", file_stream)
-            result_doc.insert_pdf(src_doc)
-            src_doc.close()
-        
-        first_name = secure_filename(uploaded_files[0].filename).rsplit('.', 1)[0]
-        output_filename = f"Merged_{first_name}_and_others.pdf"
-        output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], output_filename)
-        result_doc.save(output_path)
-        result_doc.close()
-        
-        return jsonify({'message': 'Merge successful', 'download_url': f'/download/{output_filename}'})
+        sources = [(upload.as_path(), upload.filename) for upload in uploaded_files]
+        stats = merge_pdf_files(sources, output_path, workers=workers, dedupe=dedupe,
+                                tree_min_sources=app.config['MERGE_TREE_MIN_SOURCES'])
+        return jsonify({'message': 'Merge successful', 'download_url': download_url(output_path), 'stats': stats})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    except Exception as e: return jsonify({'error': str(e)}), 500
+
+@app.route('/split-pdf', methods=['POST'])
+def split_pdf():
+    if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
+    start_page = request.form.get('start_page', type=int)
+    end_page = request.form.get('end_page', type=int)
+    mode = request.form.get('mode', 'pages')
+    if mode not in SPLIT_MODES: return jsonify({'error': f"Unknown split mode '{mode}'"}), 400
+    every = request.form.get('every', 1, type=int)
+    ranges = request.form.get('ranges', '')
+    max_mb = request.form.get('max_mb', type=float)
+    subset_fonts = form_flag('subset_fonts')
+    zip_options = zip_options_from_form()
+    workers = form_workers('SPLIT_WORKERS')
+    base_name = filename.rsplit('.', 1)[0]
+    zip_filename = f"{base_name}_split.zip"
+    zip_path = download_path(zip_filename)
+    try:
+        pdf_path = upload.as_path()
+        doc = fitz.open(pdf_path)
+        total = len(doc)
+        s = (start_page - 1) if start_page else 0
+        e = end_page if end_page else total
+        if s < 0: s = 0
+        if e > total: e = total
+        try:
+            parts = plan_split_parts(doc, base_name, mode, start=s, end=e, every=every, ranges=ranges,
+                                     max_bytes=int(max_mb * 1024 * 1024) if max_mb else None)
+        finally:
+            doc.close()
+        entries = split_pdf_parts(pdf_path, parts, workers=workers, subset_fonts=subset_fonts)
+        if form_flag('stream'):
+            return Response(release_upload_after(stream_zip(entries, **zip_options), upload), mimetype='application/zip',
+                            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'})
+        with zipfile.ZipFile(zip_path, 'w', **zip_options) as zipf:
+            for name, data in entries:
+                zipf.writestr(name, data)
+        return jsonify({'message': 'Split successful', 'download_url': download_url(zip_path), 'parts': len(parts)})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
     except Exception as e: return jsonify({'error': str(e)}), 500
 
 @app.route('/organize-pdf', methods=['POST'])
 def organize_pdf():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
-    file = request.files['file']
-    filename = secure_filename(file.filename)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pdf_path)
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
     page_order = request.form.get('page_order', '')
     output_filename = f"organized_{filename}"
-    output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], output_filename)
+    output_path = download_path(output_filename)
     try:
-        doc = fitz.open(pdf_path)
-        indices = parse_page_string(page_order, len(doc))
-        doc.select(indices)
-        doc.save(output_path)
+        doc = upload.open_pdf()
+        total = len(doc)
         doc.close()
-        return jsonify({'message': 'Success', 'download_url': f'/download/{output_filename}'})
+        indices = parse_page_string(page_order, total)
+        rotations = parse_rotations(request.form.get('rotate', ''), total)
+        mode = organize_pdf_file(upload, output_path, indices, rotations, compact=form_flag('compact'))
+        return jsonify({'message': 'Success', 'download_url': download_url(output_path), 'mode': mode})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    except Exception as e: return jsonify({'error': str(e)}), 500
+
+@app.route('/thumbnails', methods=['POST'])
+def upload_for_thumbnails():
+    if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    try:
+        doc_id, pages = get_thumbnail_cache().add_document(upload)
+        return jsonify({'doc_id': doc_id, 'pages': pages, 'thumbnail_url': f'/thumbnails/{doc_id}/<page>'})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    except Exception as e: return jsonify({'error': str(e)}), 500
+
+@app.route('/thumbnails/<doc_id>/<int:page>')
+def page_thumbnail(doc_id, page):
+    # Pages are 1-based like page_order; scale is rounded to two decimals so cache keys repeat
+    if not re.fullmatch(r'[0-9a-f]{64}', doc_id): return jsonify({'error': 'Invalid document id'}), 400
+    scale = round(min(max(request.args.get('scale', 0.2, type=float), 0.05), 1.0), 2)
+    try:
+        data = get_thumbnail_cache().get(doc_id, page - 1, scale)
+    except ValueError as e: return jsonify({'error': str(e)}), 400
     except Exception as e: return jsonify({'error': str(e)}), 500
+    if data is None: return jsonify({'error': 'Unknown document, upload it again'}), 404
+    return send_file(io.BytesIO(data), mimetype='image/png', max_age=86400)
+
+@app.route('/thumbnails/stats')
+def thumbnail_stats():
+    return jsonify(get_thumbnail_cache().stats())
 
 @app.route('/convert-to-excel', methods=['POST'])
 def convert_to_excel():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
-    file = request.files['file']
-    filename = secure_filename(file.filename)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pdf_path)
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
     excel_filename = filename.rsplit('.', 1)[0] + '.xlsx'
-    excel_path = os.path.join(app.config['DOWNLOAD_FOLDER'], excel_filename)
+    excel_path = download_path(excel_filename)
+    engine = request.form.get('engine', 'auto')
+    if engine not in EXCEL_ENGINES: return jsonify({'error': f"Unknown table engine '{engine}'"}), 400
+    workers = form_workers('EXCEL_WORKERS')
     try:
-        convert_pdf_to_excel_logic(pdf_path, excel_path)
-        return jsonify({'message': 'Success', 'download_url': f'/download/{excel_filename}'})
+        pdf_path = upload.as_path()
+        with fitz.open(pdf_path) as doc: total = len(doc)
+        # Each page is extracted once, in the order given
+        pages = list(dict.fromkeys(parse_page_string(request.form.get('pages', ''), total)))
+        region = request.form.get('region')
+        if region:
+            region = tuple(float(v) for v in region.split(','))
+            if len(region) != 4 or fitz.Rect(region).is_empty: raise ValueError('region must be "x0,y0,x1,y1" in PDF points')
+        template_dir = app.config['TABLE_TEMPLATE_FOLDER'] if form_flag('use_templates') else None
+        result = convert_pdf_to_excel_logic(pdf_path, excel_path, engine=engine, workers=workers,
+                                            prefilter=not form_flag('full_scan'), pages=pages, region=region,
+                                            template_dir=template_dir)
+        return jsonify({'message': 'Success', 'download_url': download_url(excel_path), **result})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
     except Exception as e: return jsonify({'error': str(e)}), 500
 
 @app.route('/convert-to-ppt', methods=['POST'])
 def convert_to_ppt():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
-    file = request.files['file']
-    filename = secure_filename(file.filename)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pdf_path)
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
     ppt_filename = filename.rsplit('.', 1)[0] + '.pptx'
-    ppt_path = os.path.join(app.config['DOWNLOAD_FOLDER'], ppt_filename)
+    ppt_path = download_path(ppt_filename)
+    workers = form_workers('PPT_WORKERS')
+    dpi = min(max(request.form.get('dpi', 150, type=int), 36), 600)
+    image_format = request.form.get('image_format', 'auto')
+    if image_format not in PPT_IMAGE_FORMATS: return jsonify({'error': f"Unknown image format '{image_format}'"}), 400
+    mode = request.form.get('mode', 'image')
+    if mode not in PPT_MODES: return jsonify({'error': f"Unknown conversion mode '{mode}'"}), 400
     try:
-        convert_pdf_to_pptx_logic(pdf_path, ppt_path)
-        return jsonify({'message': 'Success', 'download_url': f'/download/{ppt_filename}'})
+        raster_pages = convert_pdf_to_pptx_logic(upload.as_path(), ppt_path, workers=workers, dpi=dpi,
+                                                 image_format=image_format, mode=mode)
+        result = {'message': 'Success', 'download_url': download_url(ppt_path)}
+        if mode == 'native': result['raster_pages'] = raster_pages
+        return jsonify(result)
     except Exception as e: return jsonify({'error': str(e)}), 500
 
 @app.route('/convert-to-word', methods=['POST'])
 def convert_to_word():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
-    file = request.files['file']
-    filename = secure_filename(file.filename)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pdf_path)
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
     word_filename = filename.rsplit('.', 1)[0] + '.docx'
-    word_path = os.path.join(app.config['DOWNLOAD_FOLDER'], word_filename)
+    word_path = download_path(word_filename)
+    # start/end are 1-based and inclusive
+    start = max(request.form.get('start', 1, type=int), 1)
+    end = request.form.get('end', type=int)
+    workers = form_workers('WORD_WORKERS')
+    page_timeout = request.form.get('page_timeout', app.config['WORD_PAGE_TIMEOUT'], type=float)
+    page_max_mb = request.form.get('page_max_mb', app.config['WORD_PAGE_MAX_MB'], type=int)
+    mode = request.form.get('mode', 'layout')
+    if mode not in WORD_MODES: return jsonify({'error': f"Unknown conversion mode '{mode}'"}), 400
     try:
-        cv = Converter(pdf_path)
-        cv.convert(word_path, start=0, end=None)
-        cv.close()
-        return jsonify({'message': 'Success', 'download_url': f'/download/{word_filename}'})
+        if mode == 'text':
+            convert_pdf_to_docx_text(upload.as_path(), word_path, start=start - 1, end=end)
+            return jsonify({'message': 'Success', 'download_url': download_url(word_path), 'mode': 'text'})
+        result = convert_pdf_to_docx(upload.as_path(), word_path, start=start - 1, end=end, workers=workers,
+                                     stitch_min_pages=app.config['WORD_STITCH_MIN_PAGES'],
+                                     page_timeout=max(page_timeout, 0), page_max_bytes=max(page_max_mb, 0) * 1024 * 1024)
+        return jsonify({'message': 'Success', 'download_url': download_url(word_path), **result})
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+    except Exception as e: return jsonify({'error': str(e)}), 500
+
+@app.route('/convert-to-images', methods=['POST'])
+def convert_to_images():
+    if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
+    upload = get_upload('file')
+    if upload is None: return jsonify({'error': 'No file'}), 400
+    filename = upload.filename
+    image_format = request.form.get('format', 'png').lower().replace('jpg', 'jpeg')
+    if image_format not in IMAGE_FORMATS: return jsonify({'error': f"Unknown image format '{image_format}'"}), 400
+    dpi = min(max(request.form.get('dpi', 150, type=int), 36), 600)
+    quality = min(max(request.form.get('quality', 85, type=int), 1), 100)
+    workers = form_workers('IMAGES_WORKERS')
+    zip_options = zip_options_from_form()
+    base_name = filename.rsplit('.', 1)[0]
+    zip_filename = f"{base_name}_images.zip"
+    zip_path = download_path(zip_filename)
+    options = (dpi, image_format, quality, app.config['IMAGES_BAND_MB'] * 1024 * 1024,
+               app.config['IMAGES_MAX_MEGAPIXELS'] * 1000 * 1000)
+    try:
+        pdf_path = upload.as_path()
+        with fitz.open(pdf_path) as doc: total = len(doc)
+        # Each page is rendered once, in the order given
+        pages = list(dict.fromkeys(parse_page_string(request.form.get('pages', ''), total)))
+        if image_format != 'png':
+            max_pixels = options[4]
+            with fitz.open(pdf_path) as doc:
+                for page_num in pages:
+                    page = doc.load_page(page_num)
+                    if abs(page.rect) * (dpi / 72) ** 2 > max_pixels:
+                        return jsonify({'error': _oversized_page_message(page, dpi, max_pixels)}), 400
+        entries = render_page_images(pdf_path, pages, base_name, options, workers=workers)
+        if form_flag('stream'):
+            return Response(release_upload_after(stream_zip(entries, **zip_options), upload), mimetype='application/zip',
+                            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'})
+        with zipfile.ZipFile(zip_path, 'w', **zip_options) as zipf:
+            for name, data in entries:
+                zipf.writestr(name, data)
+        return jsonify({'message': 'Success', 'download_url': download_url(zip_path), 'images': len(pages)})
     except Exception as e: return jsonify({'error': str(e)}), 500
 
-@app.route('/download/<filename>', methods=['GET'])
-def download_file(filename):
-    return send_file(os.path.join(app.config['DOWNLOAD_FOLDER'], filename), as_attachment=True)
+@app.route('/download/<token>/<filename>', methods=['GET'])
+def download_file(token, filename):
+    if not re.fullmatch(r'[0-9a-f]{32}', token): return jsonify({'error': 'Invalid download link'}), 404
+    return send_from_directory(os.path.join(app.config['DOWNLOAD_FOLDER'], token), filename, as_attachment=True)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file